@@ -0,0 +1,115 @@
+from collections import deque
+
+import cv2
+import numpy as np
+
+from quality_gate import thumbnail
+
+HASH_METHODS = ["none", "dhash", "phash"]
+
+# 0-255 每个字节中 1 的个数，用于批量计算汉明距离
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def dhash(gray, hash_size=8):
+    """
+    brief:差分哈希，缩放到 (hash_size+1)*hash_size 后比较相邻像素的明暗，返回 hash_size*hash_size 位的字节数组。
+    """
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1])
+
+
+def phash(gray, hash_size=8):
+    """
+    brief:感知哈希，取 32x32 灰度图 DCT 的左上角低频系数与其中位数比较(不含直流分量)。
+    """
+    size = hash_size * 4
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:hash_size, :hash_size].flatten()
+    return np.packbits(low > np.median(low[1:]))
+
+
+def parse_labels(labels):
+    """
+    brief:将 "cls x1 y1 ... x4 y4" 格式的标签解析为按 (类别, 中心 x) 排序的 [(cls, 角点数组)]。
+    """
+    targets = []
+    for label in labels:
+        values = label.split()
+        pts = np.array(values[1:], dtype=np.float32).reshape(-1, 2)
+        targets.append((int(values[0]), pts))
+    targets.sort(key=lambda target: (target[0], float(target[1][:, 0].mean())))
+    return targets
+
+
+class FrameDeduper:
+    def __init__(self, method="dhash", max_distance=6, window=64, label_tol=0.02, thumb_width=160, hash_size=8):
+        """
+        brief:保存前去重。保留最近 window 个已保存帧的感知哈希，新帧与其中任意一帧的汉明距离
+        不超过 max_distance 时视为重复，不再编码与写盘。
+        label_tol > 0 时用标签几何判断哈希相近的帧：目标数量/类别不同或任一角点移动超过 label_tol
+        (归一化坐标)时仍然保存，避免画面相似但目标位置已变化的帧被丢弃；为 0 时只看哈希。
+        """
+        if method not in HASH_METHODS[1:]:
+            raise ValueError(f"Unknown hash method '{method}', available: {HASH_METHODS[1:]}")
+        self.hash_fn = dhash if method == "dhash" else phash
+        self.max_distance = max_distance
+        self.label_tol = label_tol
+        self.thumb_width = thumb_width
+        self.hash_size = hash_size
+        self.window = deque(maxlen=window)
+        self.num_checked = 0
+        self.num_duplicates = 0
+        self.num_kept_by_labels = 0  # 哈希相近但标签不同而保留的帧
+
+    def reset(self):
+        self.window.clear()
+
+    def hash(self, frame):
+        # 先快速缩到灰度缩略图，哈希函数内再用 INTER_AREA 缩到哈希尺寸
+        return self.hash_fn(thumbnail(frame, self.thumb_width), self.hash_size)
+
+    def _same_labels(self, targets, other):
+        if len(targets) != len(other):
+            return False
+        for (cls, pts), (other_cls, other_pts) in zip(targets, other):
+            if cls != other_cls or pts.shape != other_pts.shape:
+                return False
+            if np.abs(pts - other_pts).max() > self.label_tol:
+                return False
+        return True
+
+    def is_duplicate(self, frame, labels):
+        """
+        brief:判断 frame 是否与窗口内已保存的帧重复，不重复时将其加入窗口。
+        """
+        self.num_checked += 1
+        frame_hash = self.hash(frame)
+        targets = parse_labels(labels) if self.label_tol > 0 else None
+        if self.window:
+            hashes = np.stack([item[0] for item in self.window])
+            distances = POPCOUNT[np.bitwise_xor(hashes, frame_hash)].sum(axis=1)
+            similar = np.flatnonzero(distances <= self.max_distance)
+            if len(similar):
+                if targets is None or any(self._same_labels(targets, self.window[i][1]) for i in similar):
+                    self.num_duplicates += 1
+                    return True
+                self.num_kept_by_labels += 1
+        self.window.append((frame_hash, targets))
+        return False
+
+    def pop_stats(self):
+        stats = {"checked": self.num_checked, "duplicates": self.num_duplicates, "kept_by_labels": self.num_kept_by_labels}
+        self.num_checked = self.num_duplicates = self.num_kept_by_labels = 0
+        return stats
+
+    def merge_stats(self, stats):
+        self.num_checked += stats["checked"]
+        self.num_duplicates += stats["duplicates"]
+        self.num_kept_by_labels += stats["kept_by_labels"]
+
+    def summary(self):
+        return (
+            f"去重: 检测 {self.num_checked} 帧, 跳过重复 {self.num_duplicates} 帧, "
+            f"哈希相近但标签不同而保留 {self.num_kept_by_labels} 帧"
+        )
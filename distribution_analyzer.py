@@ -6,7 +6,7 @@ import matplotlib.pyplot as plt
 import yaml
 
 class DistributionAnalyzer():
-    def __init__(self, cfg="dataset_cfg.yaml"):
+    def __init__(self, cfg="dataset_cfg.yaml", show=True):
         self.cls_data = []
         self.pts_data = []
         self.pts_data_normed = []
@@ -55,6 +55,10 @@ class DistributionAnalyzer():
 
         self.getPtsDistribution()
         
+        # 无界面模式(worker 进程/--no-preview)下不显示热力图
+        if not show:
+            return
+
         # Display heatmaps
         fig = plt.figure()
         for i in range(self.num_pts - 2):
@@ -68,18 +72,18 @@ class DistributionAnalyzer():
         plt.close()   # Close the plot after 5 seconds
     
     def getPtsDistribution(self):
-        for _, label_pts in enumerate(self.pts_data):
-            transformed_label = self.normalize(label_pts)
-            self.pts_data_normed.append(transformed_label)
+        # 前两点重合的标签无法归一化，不计入分布
+        valid = np.any(self.pts_data[:, 0] != self.pts_data[:, 1], axis=1)
+        if not valid.all():
+            print(f"[WARN] Ignoring {np.count_nonzero(~valid)} prior labels whose first two points coincide")
+        self.pts_data_normed = self.normalizeBatch(self.pts_data[valid])
         
         self.getGrids()
         
-        # Walk all normalized label to calculate frequency
-        for pts_normed in self.pts_data_normed:
-            data = self.getHeatMapCoord(pts_normed)
-            data = np.floor(data).astype(np.int32)
-            for i in range(self.num_pts - 2):
-                self.pts_distibution_heatmap[i, data[i], data[i + 1]] += 1
+        # 统计所有归一化标签落在各栅格的频率，第 i 张热力图取 (data[i], data[i + 1])
+        data = np.floor(self.getHeatMapCoord(self.pts_data_normed)).astype(np.int32)
+        for i in range(self.num_pts - 2):
+            np.add.at(self.pts_distibution_heatmap[i], (data[:, i], data[:, i + 1]), 1)
         
         self.pts_distibution_heatmap /= len(self.cls_data)
         
@@ -94,35 +98,36 @@ class DistributionAnalyzer():
         self.pts_distibution_heatmap_cumsum = heatmap_lists_cumsum.reshape(-1, self.grid_num, self.grid_num)
     
     def normalize(self, pts):
-        affine_mat, _ = cv2.estimateAffinePartial2D(pts[0:2], np.array([[0, 0], [0, 1]]))
-        affine_homomat = np.vstack((affine_mat, np.array([0, 0, 1])))
-        transformed_label = np.zeros([self.num_pts, 2])
-        for i in range(self.num_pts):
-            xy_from = pts[i].reshape(-1, 1)
-            transformed_label[i] = np.matmul(affine_homomat, np.vstack((xy_from, [1])))[:-1].T
-        return transformed_label
+        return self.normalizeBatch(np.asarray(pts, dtype=np.float64)[None])[0]
+
+    def normalizeBatch(self, pts):
+        """
+        brief:将 (N, num_pts, 2) 个标签分别做相似变换，使第一点到 (0, 0)、第二点到 (0, 1)。
+        两点确定的相似变换有闭式解：视坐标为复数 z，变换为 s * (z - z0)，其中 s = i / (z1 - z0)，
+        与逐个调用 cv2.estimateAffinePartial2D 结果一致(后者内部以 float32 计算，误差约 1e-5)。
+        """
+        z = pts[..., 0] + 1j * pts[..., 1]
+        scale = 1j / (z[:, 1] - z[:, 0])
+        transformed = scale[:, None] * (z - z[:, :1])
+        return np.stack([transformed.real, transformed.imag], axis=-1)
     
     def getGrids(self):
-        self.maxs = np.zeros(2 * (self.num_pts - 2))
-        self.mins = np.zeros(2 * (self.num_pts - 2))
-        for pts_normed in self.pts_data_normed:
-            for i in range(self.num_pts - 2):
-                if pts_normed[i + 2][0] > self.maxs[2 * i]:
-                    self.maxs[2 * i] = pts_normed[i + 2][0]
-                elif pts_normed[i + 2][0] < self.mins[2 * i]:
-                    self.mins[2 * i] = pts_normed[i + 2][0]
-
-                if pts_normed[i + 2][1] > self.maxs[2 * i + 1]:
-                    self.maxs[2 * i + 1] = pts_normed[i + 2][1]
-                elif pts_normed[i + 2][1] < self.mins[2 * i + 1]:
-                    self.mins[2 * i + 1] = pts_normed[i + 2][1]
+        # 与原逐点比较的结果一致：最大值不小于 0，最小值不大于 0
+        coords = self.pts_data_normed[:, 2:].reshape(len(self.pts_data_normed), -1)
+        self.maxs = np.maximum(coords.max(axis=0, initial=0), 0)
+        self.mins = np.minimum(coords.min(axis=0, initial=0), 0)
         
         # Prevent out-of-bounds errors
         self.mins -= 1
         self.grids = (self.maxs - self.mins) / self.grid_num
     
     def getHeatMapCoord(self, pts):
-        return (self.maxs - pts[2:].reshape(1, -1)[0]) / self.grids
+        """
+        brief:单个标签 (num_pts, 2) 返回一维坐标，批量标签 (N, num_pts, 2) 返回 (N, 2 * (num_pts - 2))。
+        """
+        if pts.ndim == 2:
+            return (self.maxs - pts[2:].reshape(1, -1)[0]) / self.grids
+        return (self.maxs - pts[:, 2:].reshape(len(pts), -1)) / self.grids
     
     def isInDistribution(self, pts, vis=True):
         pts = self.normalize(pts)
@@ -156,3 +161,26 @@ class DistributionAnalyzer():
                 if self.pts_distibution_heatmap_cumsum[i, data[i], data[i + 1]] <= self.OOD_thres:
                     return False
             return True
+
+    def isInDistributionBatch(self, pts):
+        """
+        brief:批量判断 (N, num_pts, 2) 个归一化标签是否在先验分布内，返回长度为 N 的 bool 数组，
+        与逐个调用 isInDistribution(vis=False) 的结果一致。
+        超出先验数据范围的点视为分布外；前两点重合无法归一化的标签视为分布内(不参与筛选)。
+        """
+        pts = np.asarray(pts, dtype=np.float64).reshape(-1, self.num_pts, 2)
+        in_dist = np.ones(len(pts), dtype=bool)
+        valid = np.any(pts[:, 0] != pts[:, 1], axis=1)
+        if not valid.any():
+            return in_dist
+        data = np.floor(self.getHeatMapCoord(self.normalizeBatch(pts[valid]))).astype(np.int32)
+        # 与 isInDistribution 相同，第 i 张热力图取 (data[i], data[i + 1])
+        rows = data[:, : self.num_pts - 2]
+        cols = data[:, 1 : self.num_pts - 1]
+        in_range = np.all((rows >= 0) & (rows < self.grid_num) & (cols >= 0) & (cols < self.grid_num), axis=1)
+        layers = np.arange(self.num_pts - 2)
+        cumsum = self.pts_distibution_heatmap_cumsum[
+            layers, np.clip(rows, 0, self.grid_num - 1), np.clip(cols, 0, self.grid_num - 1)
+        ]
+        in_dist[valid] = in_range & np.all(cumsum > self.OOD_thres, axis=1)
+        return in_dist
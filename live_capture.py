@@ -0,0 +1,183 @@
+import time
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+def color_conversions(gx):
+    """
+    brief:像素格式 -> 转为 BGR 的 OpenCV 颜色空间代码，gx 为 gxipy 或 sim_gxipy。
+    OpenCV 的 Bayer 命名从第二行第二列起算，相机的 RG(RGGB) 对应 OpenCV 的 BayerBG。
+    """
+    entry = gx.GxPixelFormatEntry
+    codes = {
+        entry.BAYER_RG8: cv2.COLOR_BayerBG2BGR,
+        entry.BAYER_GR8: cv2.COLOR_BayerGB2BGR,
+        entry.BAYER_GB8: cv2.COLOR_BayerGR2BGR,
+        entry.BAYER_BG8: cv2.COLOR_BayerRG2BGR,
+        entry.MONO8: cv2.COLOR_GRAY2BGR,
+    }
+    # 模拟相机可直接输出 RGB8
+    if hasattr(entry, "RGB8"):
+        codes[entry.RGB8] = cv2.COLOR_RGB2BGR
+    return codes
+
+
+class FrameRing:
+    def __init__(self, num_slots=8):
+        """
+        brief:固定槽位数的环形缓冲区，槽位在第一帧到达时按帧尺寸一次性分配。
+        写满时丢弃最旧的一帧；被 get 取走、尚未 release 的槽位不会被覆盖。
+        """
+        if num_slots < 2:
+            raise ValueError("Ring buffer needs at least 2 slots")
+        self.num_slots = num_slots
+        self.buffers = None
+        self.meta = [None] * num_slots
+        self.free = deque(range(num_slots))
+        self.filled = deque()
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.num_dropped = 0
+
+    def put(self, array, *meta):
+        """
+        brief:拷贝 array 到一个空闲槽位，返回 False 表示尺寸与已分配的槽位不一致。只允许单个生产者调用。
+        """
+        with self.lock:
+            if self.buffers is None:
+                self.buffers = [np.empty_like(array) for _ in range(self.num_slots)]
+            elif self.buffers[0].shape != array.shape or self.buffers[0].dtype != array.dtype:
+                return False
+            if self.free:
+                idx = self.free.popleft()
+            else:
+                # 推理跟不上，丢弃最旧的一帧
+                idx = self.filled.popleft()
+                self.num_dropped += 1
+        np.copyto(self.buffers[idx], array)
+        with self.lock:
+            self.meta[idx] = meta
+            self.filled.append(idx)
+            self.not_empty.notify()
+        return True
+
+    def get(self, timeout=None):
+        """
+        brief:取出最旧的一帧，返回 (槽位, 数组, *meta)，超时返回 None。用完后需调用 release。
+        """
+        with self.not_empty:
+            if not self.not_empty.wait_for(lambda: self.filled, timeout):
+                return None
+            idx = self.filled.popleft()
+        return (idx, self.buffers[idx], *self.meta[idx])
+
+    def release(self, idx):
+        with self.lock:
+            self.free.append(idx)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.filled)
+
+
+class DahengCapture:
+    def __init__(self, cam, gx, frame_interval=1, num_slots=8):
+        """
+        brief:通过 register_capture_callback 取流，回调中只把原始数据拷贝进环形缓冲区后立即返回，
+        避免 SDK 内部缓冲区堆积。Bayer 转 BGR 在消费者线程 read 时进行。
+        frame_id 不连续时计为相机/SDK 侧丢帧，环形缓冲区覆盖的帧计为推理侧丢帧。
+        gx 为相机所属的 gxipy 模块(或模拟后端 sim_gxipy)。
+        """
+        self.cam = cam
+        self.success_status = gx.GxFrameStatusList.SUCCESS
+        self.conversions = color_conversions(gx)
+        self.data_stream = cam.data_stream[0]
+        self.frame_interval = frame_interval
+        self.ring = FrameRing(num_slots)
+        self.last_frame_id = None
+        self.num_received = 0
+        self.num_lost = 0
+        self.num_incomplete = 0
+        self.num_processed = 0
+        self.error = None
+        self.streaming = False
+        self.finished = False  # 相机流没有结尾，与 StreamCapture 接口一致
+
+    def start(self):
+        # SDK 只接受普通函数作为回调，不能直接注册绑定方法
+        def on_capture(raw_image):
+            self._on_capture(raw_image)
+
+        self.data_stream.register_capture_callback(on_capture)
+        self.cam.stream_on()
+        self.streaming = True
+
+    def _on_capture(self, raw_image):
+        try:
+            frame_id = raw_image.get_frame_id()
+            if self.last_frame_id is not None and frame_id > self.last_frame_id + 1:
+                self.num_lost += frame_id - self.last_frame_id - 1
+            self.last_frame_id = frame_id
+            self.num_received += 1
+
+            if raw_image.get_status() != self.success_status:
+                self.num_incomplete += 1
+                return
+            if frame_id % self.frame_interval != 0:
+                return
+            pixel_format = raw_image.get_pixel_format()
+            if pixel_format not in self.conversions:
+                raise ValueError(f"Unsupported pixel format: {hex(pixel_format)}, set the camera to an 8-bit Bayer/Mono format")
+            array = raw_image.get_numpy_array()
+            received_at = time.perf_counter()
+            if array is None or not self.ring.put(array, frame_id, raw_image.get_timestamp(), received_at, pixel_format):
+                self.num_incomplete += 1
+        except Exception as e:
+            # 回调中的异常不会传到主线程，留到 read 时抛出
+            if self.error is None:
+                self.error = e
+
+    def read(self, timeout=1.0):
+        """
+        brief:取出一帧，返回 (frame_id, timestamp, 回调收到该帧时的 perf_counter, BGR 图像)，超时返回 None。
+        """
+        if self.error is not None:
+            raise self.error
+        item = self.ring.get(timeout)
+        if item is None:
+            return None
+        idx, raw, frame_id, timestamp, received_at, pixel_format = item
+        try:
+            frame = cv2.cvtColor(raw, self.conversions[pixel_format])
+        finally:
+            self.ring.release(idx)
+        self.num_processed += 1
+        return frame_id, timestamp, received_at, frame
+
+    def stats(self):
+        return {
+            "received": self.num_received,
+            "lost": self.num_lost,
+            "incomplete": self.num_incomplete,
+            "dropped": self.ring.num_dropped,
+            "backlog": len(self.ring),
+        }
+
+    def summary(self):
+        stats = self.stats()
+        total = stats["received"] + stats["lost"]
+        return (
+            f"相机帧: 接收 {stats['received']}, 相机/SDK 丢帧 {stats['lost']} ({stats['lost'] / max(total, 1):.1%}), "
+            f"不完整 {stats['incomplete']}, 推理不及丢帧 {stats['dropped']}, 已处理 {self.num_processed}"
+        )
+
+    def stream_off(self):
+        if not self.streaming:
+            return
+        self.streaming = False
+        self.cam.stream_off()
+        self.data_stream.unregister_capture_callback()
+        self.cam.close_device()
@@ -5,21 +5,36 @@ import random
 import time
 import threading
 import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.util import Finalize
 from datetime import datetime
-from copy import deepcopy
 from pathlib import Path
 
 import cv2
 import numpy as np
 from tqdm import tqdm
-import gxipy as gx
+try:
+    import gxipy as gx
+except Exception:
+    # 未安装大恒 SDK(libgxiapi.so)时仍可使用其他输入方式和模拟相机
+    gx = None
 
 # from model.model_28cls import Model
 # from model.model_32cls import Model
 # from model.model_36cls import Model
 from model.model_64cls import Model
 from distribution_analyzer import DistributionAnalyzer
-from thirdparty.bilibili import BiliBili
+from session_profile import load_profile
+from stage_timer import StageTimer
+from preview import Preview
+from quality_gate import QualityGate
+from motion_sampler import MotionSampler
+from dedupe import HASH_METHODS, FrameDeduper
+from live_capture import DahengCapture
+import sim_gxipy
+from pipeline import SKIP_MODES, FrameReader, FrameSampler, ImageLoader, WriterPool, blank_block
+from stream_capture import StreamCapture
 
 
 class Target:
@@ -30,17 +45,95 @@ class Target:
         self.pts = np.zeros((4, 2), dtype=np.int32)
 
 
+# 多进程模式下每个 worker 进程持有一个独立的 Annotator(独立的 Model 会话与视频读取)
+_worker_annotator = None
+
+
+def _init_worker(args):
+    global _worker_annotator
+    _worker_annotator = Annotator(args, is_worker=True)
+    # worker 进程以 os._exit 退出，不执行 atexit，由 multiprocessing 在退出前关闭各自的耗时日志
+    Finalize(_worker_annotator, _worker_annotator.timer.close, exitpriority=10)
+
+
+def _process_video_in_worker(video_path, start=0, end=None):
+    annotator = _worker_annotator
+    saved_count = annotator._process_single_video(video_path, start, end)
+    failed_files, annotator.failed_files = annotator.failed_files, []
+    stats = {"gate": annotator.gate.pop_stats()}
+    if annotator.motion is not None:
+        stats["motion"] = annotator.motion.pop_stats()
+    if annotator.deduper is not None:
+        stats["dedupe"] = annotator.deduper.pop_stats()
+    if annotator.args.ood_filter:
+        stats["ood"], annotator.ood_counts = annotator.ood_counts, dict.fromkeys(annotator.ood_counts, 0)
+    if annotator.writer is not None:
+        stats["writer"] = annotator.writer.pop_stats()
+    return saved_count, failed_files, annotator.timer.pop_samples(), stats
+
+
 class Annotator:
-    def __init__(self):
+    def __init__(self, args=None, is_worker=False):
         self.failed_files = []
+        self.saved_counts = {}  # 各视频保存的帧数
         self.parser = self._init_parser()
-        self.args = self.parser.parse_args()
+        self.args = args if args is not None else self.parser.parse_args()
         self._validate_args()
 
-        self.model = Model(self.args.model)
-        self.analyzer = DistributionAnalyzer()
+        timing_log = self.args.timing_log
+        if is_worker and timing_log:
+            # 各 worker 写各自的 JSON-lines 文件，避免互相覆盖
+            timing_log = Path(timing_log).with_name(
+                f"{Path(timing_log).stem}_{os.getpid()}{Path(timing_log).suffix}"
+            )
+        self.timer = StageTimer(
+            enabled=self.args.timing or bool(self.args.timing_log),
+            log_path=timing_log,
+        )
+        self.model = Model(
+            self.args.model,
+            session_profile=load_profile(self.args.session_profile),
+            cache_dir=self.args.model_cache,
+            io_binding=self.args.io_binding,
+            timer=self.timer,
+        )
+        # worker 进程只在开启分布外筛选时加载先验分布，且不显示热力图，也不打开预览窗口
+        self.analyzer = None
+        if self.args.ood_filter or not is_worker:
+            self.analyzer = DistributionAnalyzer(show=not (is_worker or self.args.no_preview))
+        self.ood_counts = dict.fromkeys(["checked", "in_distribution"], 0)
+        self.gate = QualityGate(
+            thumb_width=self.args.thumb_width,
+            blur_thres=self.args.blur_thres,
+            overexposed_ratio=self.args.max_overexposed,
+        )
+        self.motion = None
+        if self.args.motion_sampling:
+            self.motion = MotionSampler(
+                threshold=self.args.motion_thres,
+                samples_per_min=self.args.samples_per_min,
+                max_stride=self.args.max_stride,
+                thumb_width=self.args.thumb_width,
+            )
+        self.deduper = None
+        if self.args.dedupe != "none":
+            self.deduper = FrameDeduper(
+                method=self.args.dedupe,
+                max_distance=self.args.dedupe_dist,
+                window=self.args.dedupe_window,
+                label_tol=self.args.dedupe_label_tol,
+                thumb_width=self.args.thumb_width,
+            )
+        self.preview = None
+        if not (is_worker or self.args.no_preview):
+            self.preview = Preview(self.args.preview_fps, self.args.preview_width)
+            self.preview.start()
         self.cap = None
         self.writer_lock = threading.Lock()
+        # 由写盘线程池编码并保存结果，--writers 0 时在推理线程中直接保存
+        self.writer = None
+        if self.args.writers > 0:
+            self.writer = WriterPool(self._save_data_logged, self.args.writers, self.args.queue_size)
         self._prepare_output_dir()
 
     def _init_parser(self):
@@ -60,7 +153,7 @@ class Annotator:
             "--input",
             "-i",
             type=str,
-            help="Input path (file/directory/stream URL)",
+            help="Input path (file/directory/stream URL or bilibili live room id)",
             default="/home/xu/视频/2024中部区域赛/2024RMUChero",
         )
         parser.add_argument(
@@ -84,6 +177,13 @@ class Annotator:
             help="Number of frames to skip between processing",
             default=0,
         )
+        parser.add_argument(
+            "--frame_skip",
+            type=str,
+            choices=SKIP_MODES,
+            help="How skipped frames are advanced: grab (no decode to image) or seek (jump by frame number, for large --skip_frames)",
+            default="grab",
+        )
         parser.add_argument(
             "--min_confidence",
             "-c",
@@ -95,9 +195,225 @@ class Annotator:
             "--skip_blank_frames",
             "-b",
             type=int,
-            help="Number of blank frames to skip when black/white screen is detected",
+            help="Blank-skip block size in frames: frames inside a block are skipped when both block boundary frames are black/white (videos only)",
             default=10,
         )
+        parser.add_argument(
+            "--thumb_width",
+            type=int,
+            help="Width of the thumbnail used for blank/blur/exposure checks",
+            default=160,
+        )
+        parser.add_argument(
+            "--blur_thres",
+            type=float,
+            help="Drop frames whose thumbnail Laplacian variance is below this value (0: disabled)",
+            default=0,
+        )
+        parser.add_argument(
+            "--max_overexposed",
+            type=float,
+            help="Drop frames whose fraction of saturated thumbnail pixels exceeds this value (1: disabled)",
+            default=1.0,
+        )
+        parser.add_argument(
+            "--motion_sampling",
+            action="store_true",
+            help="Only run inference on candidate frames (every --skip_frames+1 frames) whose content changed enough",
+        )
+        parser.add_argument(
+            "--motion_thres",
+            type=float,
+            help="Fraction of thumbnail pixels that must change since the last sampled frame to sample again",
+            default=0.005,
+        )
+        parser.add_argument(
+            "--samples_per_min",
+            type=float,
+            help="Motion sampling budget in sampled frames per minute of video/stream time (0: unlimited)",
+            default=60.0,
+        )
+        parser.add_argument(
+            "--max_stride",
+            type=int,
+            help="Motion sampling always samples a frame after this many frames without one (0: disabled)",
+            default=300,
+        )
+        parser.add_argument(
+            "--ood_filter",
+            action="store_true",
+            help="Only save frames with at least one detection outside the prior label distribution (OOD_thres in dataset_cfg.yaml)",
+        )
+        parser.add_argument(
+            "--dedupe",
+            type=str,
+            choices=HASH_METHODS,
+            help="Skip saving labeled frames whose perceptual hash is close to a recently saved frame",
+            default="none",
+        )
+        parser.add_argument(
+            "--dedupe_dist",
+            type=int,
+            help="Max Hamming distance (of 64 hash bits) for a frame to count as a duplicate",
+            default=6,
+        )
+        parser.add_argument(
+            "--dedupe_window",
+            type=int,
+            help="Number of recently saved frames compared against",
+            default=64,
+        )
+        parser.add_argument(
+            "--dedupe_label_tol",
+            type=float,
+            help="Keep hash-similar frames whose labels differ or whose corners moved more than this normalized distance (0: hash only)",
+            default=0.02,
+        )
+        parser.add_argument(
+            "--batch_size",
+            "-n",
+            type=int,
+            help="Number of sampled frames fed to the model per inference call",
+            default=1,
+        )
+        parser.add_argument(
+            "--session_profile",
+            "-p",
+            type=str,
+            help="ONNX Runtime session profile defined in session_cfg.yaml",
+            default="default",
+        )
+        parser.add_argument(
+            "--model_cache",
+            type=str,
+            help="Directory for cached optimized models (disabled if not set)",
+            default=None,
+        )
+        parser.add_argument(
+            "--io_binding",
+            action="store_true",
+            help="Bind model input/output buffers once and reuse them every frame",
+        )
+        parser.add_argument(
+            "--timing",
+            action="store_true",
+            help="Record per-stage latency and report percentiles/histograms at the end",
+        )
+        parser.add_argument(
+            "--timing_log",
+            type=str,
+            help="JSON-lines file for per-frame stage timings (implies --timing)",
+            default=None,
+        )
+        parser.add_argument(
+            "--ring_size",
+            type=int,
+            help="Number of preallocated frame slots buffered between the camera callback and inference (daheng)",
+            default=8,
+        )
+        parser.add_argument(
+            "--stream_timeout",
+            type=float,
+            help="Open/read timeout in seconds for network streams",
+            default=10,
+        )
+        parser.add_argument(
+            "--stream_retries",
+            type=int,
+            help="Give up after this many consecutive failed reconnects (0: retry forever)",
+            default=10,
+        )
+        parser.add_argument(
+            "--live_duration",
+            type=float,
+            help="Stop live (daheng/stream) labeling after this many seconds (0: until Ctrl-C)",
+            default=0,
+        )
+        parser.add_argument(
+            "--sim_camera",
+            type=str,
+            help="Replay a video file or image folder through a simulated Daheng camera (daheng)",
+            default=None,
+        )
+        parser.add_argument(
+            "--sim_fps",
+            type=float,
+            help="Frame rate of the simulated camera",
+            default=30,
+        )
+        parser.add_argument(
+            "--sim_jitter",
+            type=float,
+            help="Standard deviation of the simulated frame interval jitter in ms",
+            default=0,
+        )
+        parser.add_argument(
+            "--sim_drop_rate",
+            type=float,
+            help="Probability that the simulated camera drops a frame",
+            default=0,
+        )
+        parser.add_argument(
+            "--sim_pixel_format",
+            type=str,
+            choices=list(sim_gxipy.PIXEL_FORMATS),
+            help="Raw pixel format delivered by the simulated camera",
+            default="bayer_rg",
+        )
+        parser.add_argument(
+            "--no-preview",
+            dest="no_preview",
+            action="store_true",
+            help="Headless mode, do not open the preview window",
+        )
+        parser.add_argument(
+            "--preview_fps",
+            type=float,
+            help="Maximum refresh rate of the preview window",
+            default=10,
+        )
+        parser.add_argument(
+            "--preview_width",
+            type=int,
+            help="Preview frames are downscaled to at most this width",
+            default=960,
+        )
+        parser.add_argument(
+            "--pipeline",
+            action="store_true",
+            help="Decode frames in a separate thread, overlapping with inference",
+        )
+        parser.add_argument(
+            "--writers",
+            type=int,
+            help="Number of threads encoding and writing results (0: write on the inference thread)",
+            default=4,
+        )
+        parser.add_argument(
+            "--readers",
+            type=int,
+            help="Number of threads decoding images ahead of inference (local_imgs)",
+            default=4,
+        )
+        parser.add_argument(
+            "--queue_size",
+            type=int,
+            help="Capacity of the bounded decode/write queues and image prefetch depth",
+            default=32,
+        )
+        parser.add_argument(
+            "--workers",
+            "-w",
+            type=int,
+            help="Number of worker processes that label videos in parallel (local_video)",
+            default=1,
+        )
+        parser.add_argument(
+            "--shards",
+            type=int,
+            help="Split each video into N frame ranges processed by parallel workers (local_video)",
+            default=1,
+        )
         return parser
 
     def _validate_args(self):
@@ -105,6 +421,32 @@ class Annotator:
             raise ValueError("Input path is required for local images/video")
         if self.args.type == "stream" and not self.args.input:
             raise ValueError("Stream URL is required for stream type")
+        if self.args.batch_size < 1:
+            raise ValueError("Batch size must be a positive integer")
+        if self.args.writers < 0:
+            raise ValueError("Writer count must be a non-negative integer")
+        if self.args.sim_fps <= 0 or self.args.sim_jitter < 0 or not 0 <= self.args.sim_drop_rate < 1:
+            raise ValueError("Simulated camera needs fps > 0, jitter >= 0 and drop rate in [0, 1)")
+        if self.args.stream_timeout <= 0 or self.args.stream_retries < 0:
+            raise ValueError("Stream timeout must be positive and retries non-negative")
+        if self.args.skip_blank_frames < 0 or self.args.thumb_width < 8 or self.args.blur_thres < 0:
+            raise ValueError("Blank skip count and blur threshold must be non-negative, thumbnail width at least 8")
+        if not 0 <= self.args.motion_thres <= 1 or self.args.samples_per_min < 0 or self.args.max_stride < 0:
+            raise ValueError("Motion threshold must be in [0, 1], sampling budget and max stride non-negative")
+        if 0 < self.args.max_stride <= self.args.skip_frames:
+            raise ValueError("Max stride must be larger than --skip_frames")
+        if not 0 <= self.args.dedupe_dist <= 64 or self.args.dedupe_window < 1 or self.args.dedupe_label_tol < 0:
+            raise ValueError("Dedupe distance must be in [0, 64], window positive and label tolerance non-negative")
+        if not 0 <= self.args.max_overexposed <= 1:
+            raise ValueError("Overexposed fraction must be in [0, 1]")
+        if self.args.ring_size < 2:
+            raise ValueError("Ring buffer size must be at least 2")
+        if self.args.preview_fps <= 0 or self.args.preview_width < 1:
+            raise ValueError("Preview rate and width must be positive")
+        if self.args.readers < 1 or self.args.queue_size < 1:
+            raise ValueError("Reader count and queue size must be positive integers")
+        if self.args.workers < 1 or self.args.shards < 1:
+            raise ValueError("Worker and shard counts must be positive integers")
 
     def _prepare_output_dir(self):
         Path(self.args.dst_dir).mkdir(parents=True, exist_ok=True)
@@ -127,44 +469,101 @@ class Annotator:
             "daheng": self._init_daheng,
             "local_imgs": self._load_images,
             "local_video": self._get_video_files,
-            "stream": lambda: cv2.VideoCapture(self._get_bilibili_stream()),
+            "stream": self._init_stream,
         }
         return src_map[self.args.type]()
 
     def _init_daheng(self):
-        device_manager = gx.DeviceManager()
+        if self.args.sim_camera:
+            backend = sim_gxipy
+            device_manager = sim_gxipy.DeviceManager(
+                self.args.sim_camera,
+                fps=self.args.sim_fps,
+                jitter=self.args.sim_jitter / 1000,
+                drop_rate=self.args.sim_drop_rate,
+                pixel_format=self.args.sim_pixel_format,
+            )
+        else:
+            if gx is None:
+                raise RuntimeError("gxipy is not available, install the Daheng SDK or use --sim_camera")
+            backend = gx
+            device_manager = gx.DeviceManager()
         dev_num, dev_info_list = device_manager.update_device_list()
         if dev_num == 0:
             raise RuntimeError("No Daheng devices found")
 
         cam = device_manager.open_device_by_index(1)
-        cam.stream_on()
+        capture = DahengCapture(cam, backend, self.args.skip_frames + 1, self.args.ring_size)
+        capture.start()
         cam.BalanceWhiteAuto.set(2)
-        return cam
+        return capture
+
+    def _init_stream(self):
+        capture = StreamCapture(
+            self.args.input,
+            self.args.skip_frames + 1,
+            timeout=self.args.stream_timeout,
+            max_retries=self.args.stream_retries,
+        )
+        capture.start()
+        return capture
 
     def _load_images(self):
         valid_ext = {".jpg", ".png", ".jpeg", ".bmp", ".tiff"}
-        img_files = [
+        img_files = sorted(
             f
             for f in Path(self.args.input).rglob("*")
             if f.suffix.lower() in valid_ext and f.is_file()
-        ]
-        return [cv2.imread(str(p)) for p in tqdm(img_files, desc="Loading images")]
+        )
+        # 不再一次性读入全部图片，由线程池边推理边预读
+        return ImageLoader(img_files, self.args.readers, self.args.queue_size, self.timer)
+
+    def _image_name(self, img_path):
+        # 以相对 --input 的路径命名，避免不同子文件夹中的同名图片互相覆盖
+        return "_".join(Path(img_path).relative_to(self.args.input).with_suffix("").parts)
+
+    def _check_quality(self, frame):
+        with self.timer.measure("quality_gate"):
+            return self.gate.check(frame)
+
+    def _is_out_of_distribution(self, labels):
+        """
+        brief:一帧的所有检测一次性与先验分布比较，至少有一个目标在分布外时返回 True。
+        """
+        if not self.args.ood_filter:
+            return True
+        with self.timer.measure("ood_filter"):
+            pts = np.array([label.split()[1:] for label in labels], dtype=np.float64)
+            in_dist = self.analyzer.isInDistributionBatch(pts)
+        self.ood_counts["checked"] += 1
+        if in_dist.all():
+            self.ood_counts["in_distribution"] += 1
+            return False
+        return True
+
+    def _is_duplicate(self, frame, labels):
+        if self.deduper is None:
+            return False
+        with self.timer.measure("dedupe"):
+            return self.deduper.is_duplicate(frame, labels)
 
     def _process_frame(self, frame, frame_idx=0):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        blank_cnt = 0
+        return self._process_batch([frame])[0]
 
-        # 检测黑白屏并跳过
-        if np.mean(gray) < 10 and np.var(gray) < 10:
-            blank_cnt += 1
-            if blank_cnt % self.args.skip_blank_frames == 0:
-                print(
-                    f"[WARN] Blank screen detected, skipping next {self.args.skip_blank_frames} frames."
-                )
-            return None
+    def _process_batch(self, frames):
+        """
+        brief:对一组采样帧做质量检测与批量推理，返回与 frames 一一对应的标签列表。
+        不合格的帧不推理，标签为 None。
+        """
+        labels_list = [None] * len(frames)
+        reasons = [self._check_quality(frame) for frame in frames]
+        valid_idx = [i for i, reason in enumerate(reasons) if reason is None]
+        results_list = self.model.infer_batch([frames[i] for i in valid_idx])
+        for i, results in zip(valid_idx, results_list):
+            labels_list[i] = self._collect_labels(frames[i], results)
+        return labels_list
 
-        results = self.model.infer(frame)
+    def _collect_labels(self, frame, results):
         # if results:  
         #     print("1111111111111111111111111111")
         # 有效检测
@@ -186,7 +585,9 @@ class Annotator:
             #     print(f"Found {len(valid_detections)} valid detections.")
             labels.append(label_data)
 
-        self._visualize(frame, valid_detections)
+        if self.preview is not None:
+            with self.timer.measure("visualize"):
+                self.preview.submit(frame, valid_detections)
         return labels
 
     @staticmethod
@@ -207,39 +608,73 @@ class Annotator:
             label.append(f"{y / h:.5f}")
         return " ".join(label)
 
-    def _visualize(self, frame, detections):
-        display_frame = deepcopy(frame)
-        for det in detections:
-            color = (0, 255, 0)  # BGR
-            pts = det.pts.reshape((-1, 1, 2)).astype(np.int32)
-            cv2.polylines(display_frame, [pts], True, color, 2)
-
-            text = f"ID:{det.id} Conf:{det.conf:.2f}"
-            cv2.putText(
-                display_frame,
-                text,
-                (pts[0][0][0], pts[0][0][1] - 10),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.5,
-                color,
-                1,
-            )
-            # print(f"pts: {pts[0][0]}")
-        cv2.imshow("Preview", display_frame)
-        cv2.waitKey(1)
-
     def save_data(self, frame, labels, frame_idx, video_name):
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        base_name = f"{video_name}_{timestamp}_{frame_idx:08d}"
+        """
+        brief:保存图像与标签，frame_idx 为 None 时(图片输入)直接以 video_name 即原图片名命名。
+        """
+        if frame_idx is None:
+            base_name = video_name
+        else:
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            base_name = f"{video_name}_{timestamp}_{frame_idx:08d}"
 
         img_path = Path(self.args.dst_dir) / f"{base_name}.jpg"
-        cv2.imwrite(str(img_path), frame)
+        ret, jpg = cv2.imencode(".jpg", frame)
+        if not ret:
+            raise RuntimeError(f"Failed to encode image: {img_path}")
+        label = "\n".join(labels)
+
+        # 先写临时文件再重命名，中断时不会留下不完整的图像/标签
+        # 标签在图像之后写入，存在 txt 即说明对应 jpg 已完整
+        self._atomic_write(img_path, jpg.tobytes(), "wb")
+        self._atomic_write(img_path.with_suffix(".txt"), label, "w")
+        return jpg.nbytes + len(label)
+
+    @staticmethod
+    def _atomic_write(path, data, mode):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _save_batch(self, pending, video_name):
+        """
+        brief:推理并保存一批 (frame_idx, frame)，返回保存的帧数。
+        """
+        saved_count = 0
+        labels_list = self._process_batch([frame for _, frame in pending])
+        for (frame_idx, frame), labels in zip(pending, labels_list):
+            if labels and self._is_out_of_distribution(labels) and not self._is_duplicate(frame, labels):
+                self._save(frame, labels, frame_idx, video_name)
+                saved_count += 1
+        self.timer.end_frame(video=video_name, frame_idx=[frame_idx for frame_idx, _ in pending])
+        return saved_count
+
+    def _save(self, frame, labels, frame_idx, video_name):
+        if self.writer is not None:
+            self.writer.submit(frame, labels, frame_idx, video_name)
+            return
+        with self.writer_lock:
+            self._save_data_timed(frame, labels, frame_idx, video_name)
+
+    def _save_data_timed(self, frame, labels, frame_idx, video_name):
+        with self.timer.measure("save"):
+            return self.save_data(frame, labels, frame_idx, video_name)
 
-        label_path = img_path.with_suffix(".txt")
-        with open(label_path, "w") as f:
-            f.write("\n".join(labels))
+    def _save_data_logged(self, frame, labels, frame_idx, video_name):
+        """
+        brief:写盘线程中保存一帧。该帧的推理记录此时已经写出，save 耗时单独写一条带帧序号的记录。
+        """
+        try:
+            return self._save_data_timed(frame, labels, frame_idx, video_name)
+        finally:
+            self.timer.end_frame(video=video_name, frame_idx=frame_idx, thread="writer")
 
-    def _process_single_video(self, video_path):
+    def _process_single_video(self, video_path, start=0, end=None):
+        """
+        brief:处理视频中 [start, end) 范围内的帧，end 为 None 时处理到视频结尾。
+        帧序号始终为在整个视频中的真实序号，分段处理时输出文件名与顺序处理一致。
+        """
         print(f"\nProcessing: {video_path}")
         cap = cv2.VideoCapture(str(video_path))
         if not cap.isOpened():
@@ -250,44 +685,265 @@ class Annotator:
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         frame_interval = self.args.skip_frames + 1
         video_name = Path(video_path).stem
-        saved_count = 0  # 新增保存计数器
+        desc = video_name
+        if start > 0 or end is not None:
+            total_frames = (total_frames if end is None else end) - start
+            desc = f"{video_name}[{start}:{'' if end is None else end}]"
 
+        if self.deduper is not None:
+            self.deduper.reset()
         try:
-            with tqdm(total=total_frames, unit="frame", desc=video_name) as pbar:
-                frame_idx = 0
-                while True:
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
-
-                    if frame_idx % frame_interval == 0:
-                        labels = self._process_frame(frame, frame_idx)
-                        if labels:
-                            with self.writer_lock:
-                                self.save_data(frame, labels, frame_idx, video_name)
-                                saved_count += 1  # 每次保存时增加计数
-
-                    pbar.update(1)
-                    frame_idx += 1
+            cap = self._seek(cap, video_path, start)
+            # 黑白屏检测需要回退而 seek 不可用时，由 FrameSampler 重新打开视频
+            reopen = lambda: cv2.VideoCapture(str(video_path))
+            with tqdm(total=total_frames, unit="frame", desc=desc) as pbar:
+                if self.args.pipeline:
+                    num_frames, saved_count = self._run_pipeline(
+                        cap, frame_interval, video_name, pbar, start, end, reopen
+                    )
+                else:
+                    num_frames, saved_count = self._run_sequential(
+                        cap, frame_interval, video_name, pbar, start, end, reopen
+                    )
+            # 等待本视频的写盘任务全部完成，写盘失败时视为视频处理失败
+            if self.writer is not None:
+                self.writer.flush()
         except Exception as e:
             print(f"处理视频时发生异常: {str(e)}")
             self.failed_files.append(str(video_path))  # 记录异常视频
+            if self.writer is not None:
+                # 本视频剩余写盘任务的错误不再算到下一个视频上
+                self.writer.flush(discard_errors=True)
             return 0
         finally:
             cap.release()
 
-        print(f"√ 完成处理: {video_name}")
-        print(f"• 总处理帧数: {frame_idx}")
+        print(f"√ 完成处理: {desc}")
+        print(f"• 总处理帧数: {num_frames}")
         print(f"• 保存有效帧数: {saved_count}")
-        print(f"• 保存率: {saved_count / (frame_idx / frame_interval):.1%}")
+        print(f"• 保存率: {saved_count / max(num_frames / frame_interval, 1):.1%}")
+        self.saved_counts[str(video_path)] = saved_count
         return saved_count
 
+    @staticmethod
+    def _seek(cap, video_path, frame_idx):
+        """
+        brief:将 cap 定位到第 frame_idx 帧。部分编码格式按帧号 seek 不准确，
+        此时重新打开视频并逐帧 grab 到目标位置，保证帧序号与顺序读取一致。
+        """
+        if frame_idx == 0:
+            return cap
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_idx:
+            return cap
+
+        print(f"[WARN] Inaccurate seek in {video_path}, grabbing {frame_idx} frames instead.")
+        cap.release()
+        cap = cv2.VideoCapture(str(video_path))
+        for _ in range(frame_idx):
+            if not cap.grab():
+                break
+        return cap
+
+    def _split_video(self, video_path, num_shards):
+        """
+        brief:按帧数将视频均分为 num_shards 个 [start, end) 范围，最后一段读到视频结尾。
+        """
+        cap = cv2.VideoCapture(str(video_path))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+        cap.release()
+        # 帧数未知或过短时不分段
+        if total_frames < num_shards * 2:
+            return [(0, None)]
+        bounds = np.linspace(0, total_frames, num_shards + 1).astype(int)
+        # 分段边界对齐到黑白屏跳过的块边界，各段的跳过结果与不分段时一致
+        block = blank_block(self.args.skip_blank_frames, self.args.skip_frames + 1)
+        if block > 0:
+            bounds = np.round(bounds / block).astype(int) * block
+        bounds = sorted(set(bounds[:-1].tolist()))
+        return [(start, end) for start, end in zip(bounds[:-1], bounds[1:])] + [(bounds[-1], None)]
+
+    def _run_sequential(self, cap, frame_interval, video_name, pbar, start=0, end=None, reopen=None):
+        saved_count = 0  # 新增保存计数器
+        pending = []  # 待推理的采样帧 (frame_idx, frame)
+        sampler = FrameSampler(
+            cap,
+            frame_interval,
+            start,
+            end,
+            self.args.frame_skip,
+            self.timer,
+            self.motion,
+            self.gate.is_blank,
+            self.args.skip_blank_frames,
+            reopen,
+        )
+        for frame_idx, frame in sampler:
+            pending.append((frame_idx, frame))
+            if len(pending) >= self.args.batch_size:
+                saved_count += self._save_batch(pending, video_name)
+                pending = []
+            self._update_progress(pbar, sampler.num_read)
+        if pending:
+            saved_count += self._save_batch(pending, video_name)
+        self._update_progress(pbar, sampler.num_read)
+        self.gate.num_skipped += sampler.num_blank_skipped
+        return sampler.num_read, saved_count
+
+    def _run_pipeline(self, cap, frame_interval, video_name, pbar, start=0, end=None, reopen=None):
+        """
+        brief:解码线程 -> 推理(当前线程) -> 写盘线程池，各阶段之间为有界队列。
+        """
+        saved_count = 0
+        reader = FrameReader(
+            cap,
+            frame_interval,
+            self.args.queue_size,
+            self.timer,
+            start,
+            end,
+            self.args.frame_skip,
+            self.motion,
+            self.gate.is_blank,
+            self.args.skip_blank_frames,
+            reopen,
+        )
+        reader.start()
+        try:
+            for pending in reader.batches(self.args.batch_size):
+                saved_count += self._save_batch(pending, video_name)
+                self._update_progress(pbar, reader.num_read)
+        finally:
+            reader.stop()
+        self._update_progress(pbar, reader.num_read)
+        self.gate.num_skipped += reader.sampler.num_blank_skipped
+        return reader.num_read, saved_count
+
+    def _process_live(self, capture, source_name):
+        """
+        brief:实时标注相机/网络流画面，直到 Ctrl-C、--live_duration 到时或有限源结束。推理跟不上时由 capture 丢弃旧帧，
+        文件名中的帧序号为相机 frame_id 或网络流的解码帧序号。
+        live_latency 为收到帧到该帧推理完成的耗时。
+        """
+        print(f"\nLabeling live frames from {source_name}, press Ctrl-C to stop...")
+        saved_count = 0
+        if self.motion is not None:
+            self.motion.reset()
+        if self.deduper is not None:
+            self.deduper.reset()
+        deadline = time.perf_counter() + self.args.live_duration if self.args.live_duration > 0 else None
+        try:
+            with tqdm(unit="frame", desc=source_name) as pbar:
+                while deadline is None or time.perf_counter() < deadline:
+                    item = capture.read(timeout=1.0)
+                    if item is None:
+                        if capture.finished:
+                            print(f"\n{source_name} reached end of stream.")
+                            break
+                        continue
+                    frame_id, _, received_at, frame = item
+                    if self.motion is not None:
+                        with self.timer.measure("motion"):
+                            accepted = self.motion.accept(frame, frame_id, received_at)
+                        if not accepted:
+                            pbar.update(1)
+                            continue
+                    saved_count += self._save_batch([(frame_id, frame)], source_name)
+                    self.timer.add("live_latency", time.perf_counter() - received_at)
+                    self.saved_counts[source_name] = saved_count
+                    postfix = capture.stats()
+                    if self.writer is not None:
+                        postfix["write_queue"] = self.writer.depth
+                    pbar.set_postfix(postfix, refresh=False)
+                    pbar.update(1)
+        except KeyboardInterrupt:
+            print("\nUser interrupted live labeling.")
+        # 写盘错误在 submit 时就会抛出，这里等待最后几帧写完并检查
+        if self.writer is not None:
+            self.writer.flush()
+
+    def _update_progress(self, pbar, num_read):
+        if self.writer is not None:
+            pbar.set_postfix(write_queue=self.writer.depth, refresh=False)
+        pbar.update(num_read - pbar.n)
+
+    def _process_videos_parallel(self, video_paths):
+        """
+        brief:将视频分发到进程池，每个 worker 使用自己的 Model 会话与视频读取，
+        结果(保存帧数、失败视频、阶段耗时)汇总回主进程。
+        --shards 大于 1 时每个视频再按帧范围切分，各段分别交给 worker 处理。
+        """
+        tasks = []
+        for video_path in video_paths:
+            ranges = self._split_video(video_path, self.args.shards) if self.args.shards > 1 else [(0, None)]
+            tasks.extend((str(video_path), start, end) for start, end in ranges)
+        total_tasks = len(tasks)
+        # 单个长视频分段时默认每段一个 worker
+        num_workers = self.args.workers if self.args.workers > 1 else self.args.shards
+        # spawn 避免 fork 继承主进程中 onnxruntime 的线程状态
+        with ProcessPoolExecutor(
+            max_workers=min(num_workers, total_tasks),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.args,),
+        ) as pool:
+            futures = {pool.submit(_process_video_in_worker, *task): task for task in tasks}
+            try:
+                for idx, future in enumerate(as_completed(futures), 1):
+                    video_path, start, end = futures[future]
+                    try:
+                        saved_count, failed_files, samples, stats = future.result()
+                    except Exception as e:
+                        print(f"处理视频时发生异常: {str(e)}")
+                        saved_count, failed_files, samples, stats = 0, [video_path], {}, {}
+                    # 同一视频的多个分段累加，失败只记录一次
+                    self.saved_counts[video_path] = self.saved_counts.get(video_path, 0) + saved_count
+                    self.failed_files.extend(f for f in failed_files if f not in self.failed_files)
+                    self.timer.merge(samples)
+                    if "gate" in stats:
+                        self.gate.merge_stats(stats["gate"])
+                    if "motion" in stats and self.motion is not None:
+                        self.motion.merge_stats(stats["motion"])
+                    if "ood" in stats:
+                        for key, value in stats["ood"].items():
+                            self.ood_counts[key] += value
+                    if "dedupe" in stats and self.deduper is not None:
+                        self.deduper.merge_stats(stats["dedupe"])
+                    if "writer" in stats and self.writer is not None:
+                        self.writer.merge_stats(stats["writer"])
+                    desc = video_path if (start, end) == (0, None) else f"{video_path}[{start}:{'' if end is None else end}]"
+                    print(f"\n[{idx}/{total_tasks}] 完成: {desc} (保存 {saved_count} 帧)")
+            except KeyboardInterrupt:
+                for future in futures:
+                    future.cancel()
+                raise
+
     def _process_image_batch(self):
         print(f"\nProcessing {len(self.cap)} images...")
-        for idx, img in enumerate(tqdm(self.cap)):
-            labels = self._process_frame(img)
-            if labels:
-                self.save_data(img, labels, idx, "image")
+        pending = []  # 待推理的图片 (输出文件名, img)
+        try:
+            for img_path, img in tqdm(self.cap, total=len(self.cap)):
+                if img is None:
+                    print(f"Failed to read image: {img_path}")
+                    self.failed_files.append(str(img_path))
+                    continue
+                pending.append((self._image_name(img_path), img))
+                if len(pending) >= self.args.batch_size:
+                    self._save_image_batch(pending)
+                    pending = []
+            if pending:
+                self._save_image_batch(pending)
+            if self.writer is not None:
+                self.writer.flush()
+        finally:
+            self.cap.close()
+
+    def _save_image_batch(self, pending):
+        labels_list = self._process_batch([img for _, img in pending])
+        for (name, img), labels in zip(pending, labels_list):
+            if labels and self._is_out_of_distribution(labels) and not self._is_duplicate(img, labels):
+                self._save(img, labels, None, name)
+        self.timer.end_frame(video="image", frame_idx=[name for name, _ in pending])
 
     def run(self):
         try:
@@ -295,8 +951,12 @@ class Annotator:
 
             if self.args.type == "local_imgs":
                 self._process_image_batch()
+            elif self.args.type in ["daheng", "stream"]:
+                self._process_live(self.cap, self.args.type)
             elif self.args.type == "local_video":
-                if isinstance(self.cap, list):
+                if isinstance(self.cap, list) and (self.args.workers > 1 or self.args.shards > 1):
+                    self._process_videos_parallel(self.cap)
+                elif isinstance(self.cap, list):
                     total_videos = len(self.cap)
                     for idx, video_path in enumerate(self.cap, 1):
                         print(f"\n{'=' * 40}")
@@ -315,7 +975,29 @@ class Annotator:
             # 新增失败文件输出
             if hasattr(self.cap, "stream_off"):
                 self.cap.stream_off()
-            cv2.destroyAllWindows()
+                print(f"\n{self.cap.summary()}")
+            if self.writer is not None:
+                self.writer.shutdown()
+                print(f"\n{self.writer.summary()}")
+            if self.motion is not None and self.motion.num_candidates:
+                print(self.motion.summary())
+            if self.gate.num_checked:
+                print(self.gate.summary())
+            if self.ood_counts["checked"]:
+                print(
+                    f"分布外筛选: 检测 {self.ood_counts['checked']} 帧, "
+                    f"全部目标在先验分布内而跳过 {self.ood_counts['in_distribution']} 帧"
+                )
+            if self.deduper is not None and self.deduper.num_checked:
+                print(self.deduper.summary())
+            if self.preview is not None:
+                self.preview.stop()
+
+            if len(self.saved_counts) > 1:
+                print("\n\n" + "=" * 60)
+                print(f"已处理视频 {len(self.saved_counts)} 个, 共保存 {sum(self.saved_counts.values())} 帧:")
+                for path, saved_count in sorted(self.saved_counts.items()):
+                    print(f"• {path}: {saved_count}")
 
             if self.failed_files:
                 print("\n\n" + "=" * 60)
@@ -329,6 +1011,9 @@ class Annotator:
                     f.write("\n".join(self.failed_files))
                 print(f"\n失败列表已保存至: {log_path}")
 
+            self.timer.report(Path(self.args.dst_dir) / "stage_timing.txt")
+            self.timer.close()
+
 
 if __name__ == "__main__":
     try:
@@ -1,165 +1,268 @@
 import os
+import time
 import cv2
 import numpy as np
-import torch
 import onnxruntime as rt
+from session_profile import create_session
+from stage_timer import StageTimer
 import argparse
 import math
 
 
 class Model:
     def __init__(
-        self, model_pth="model_32cls.onnx", topk=128, conf_thres=0.9, nms_thres=0.1
+        self,
+        model_pth="model_32cls.onnx",
+        topk=128,
+        conf_thres=0.9,
+        nms_thres=0.1,
+        session_profile=None,
+        cache_dir=None,
+        io_binding=False,
+        timer=None,
     ):
         self.model_path = model_pth
         self.topk = topk
         self.conf_thres = conf_thres
         self.nms_thres = nms_thres
-        self.model = rt.InferenceSession(model_pth)
+        self.timer = timer or StageTimer(enabled=False)
+        self.model = create_session(model_pth, session_profile, cache_dir=cache_dir)
         self.input = self.model.get_inputs()[0]
         self.output = self.model.get_outputs()[0]
+        # 导出时固定了 batch 维的模型只能按该大小分块推理, 动态 batch 维为字符串
+        self.batch_size = self.input.shape[0] if isinstance(self.input.shape[0], int) else None
+        # letterbox 参数按源分辨率缓存，输入张量在帧间复用
+        self.letterbox_cache = {}
+        self.input_buffer = np.zeros((1, *self.input.shape[1:]), dtype=np.float32)
+        self.batch_buffer = None
+        # IO binding 模式下 ORT 直接读 batch 输入缓冲区、把预测写入持久的输出缓冲区，绑定按分块缓存复用
+        self.use_io_binding = False
+        self.bindings = {}
+        self.batch_output_buffer = None
+        if io_binding:
+            self.bind_io()
 
-    def resize(self, img, size):
-        height_src, width_src = img.shape[:2]  # origin hw
-        resize_factor_x = size[3] / width_src  # resize image to img_size
-        resize_factor_y = size[2] / height_src  # resize image to img_size
-        resize_factor = min(resize_factor_x, resize_factor_y)
-        dst = cv2.resize(
+    def letterbox_geometry(self, height_src, width_src):
+        """
+        brief:计算某一源分辨率的 letterbox 参数并缓存，同一分辨率只计算一次。
+        """
+        key = (height_src, width_src)
+        if key not in self.letterbox_cache:
+            size = self.input.shape
+            resize_factor_x = size[3] / width_src  # resize image to img_size
+            resize_factor_y = size[2] / height_src  # resize image to img_size
+            resize_factor = min(resize_factor_x, resize_factor_y)
+            resized_w = int(width_src * resize_factor)
+            resized_h = int(height_src * resize_factor)
+            padding_top = round(height_src * (resize_factor_y - resize_factor) * 0.5)
+            padding_left = round(width_src * (resize_factor_x - resize_factor) * 0.5)
+            self.letterbox_cache[key] = Letterbox(
+                np.array([[1 / resize_factor, 0], [0, 1 / resize_factor]]),
+                np.array([padding_left, padding_top]),
+                np.empty((resized_h, resized_w, 3), dtype=np.uint8),
+            )
+        return self.letterbox_cache[key]
+
+    def letterbox(self, img, dst):
+        """
+        brief:将 img letterbox 后直接写入 dst((C, H, W) float32)，返回 resize_matrix, resize_vector。
+        缩放结果写入按分辨率缓存的 uint8 缓冲区，每帧不再分配中间图像。
+        """
+        geometry = self.letterbox_geometry(*img.shape[:2])
+        resized_h, resized_w = geometry.resized.shape[:2]
+        resized = cv2.resize(
             img,
-            (int(width_src * resize_factor), int(height_src * resize_factor)),
+            (resized_w, resized_h),
+            dst=geometry.resized,
             interpolation=cv2.INTER_LINEAR,
         )
-        padding_top = round(height_src * (resize_factor_y - resize_factor) * 0.5)
-        padding_bottom = size[2] - dst.shape[0] - padding_top
-        padding_left = round(width_src * (resize_factor_x - resize_factor) * 0.5)
-        padding_right = size[3] - dst.shape[1] - padding_left
-        dst = cv2.copyMakeBorder(
-            dst,
-            padding_top,
-            padding_bottom,
-            padding_left,
-            padding_right,
-            cv2.BORDER_CONSTANT,
-            (0, 0, 0),
+        padding_left, padding_top = geometry.resize_vector
+        bottom = padding_top + resized_h
+        right = padding_left + resized_w
+        # dst 可能写过其他分辨率的图像，填充区域每次重新置零
+        dst[:, :padding_top] = 0
+        dst[:, bottom:] = 0
+        dst[:, padding_top:bottom, :padding_left] = 0
+        dst[:, padding_top:bottom, right:] = 0
+        # HWC uint8 -> CHW float32，直接写入输入缓冲区
+        np.copyto(
+            dst[:, padding_top:bottom, padding_left:right],
+            resized.transpose(2, 0, 1),
+            casting="unsafe",
         )
-        self.resize_matrix = np.array([[1 / resize_factor, 0], [0, 1 / resize_factor]])
-        self.resize_vector = np.array([padding_left, padding_top])
-        return self.resize_matrix, self.resize_vector, dst
-
-    def is_overlapped(self, bbox_1, bbox_2, iou_thres):
-        box_1 = cv2.boundingRect(bbox_1)
-        box_2 = cv2.boundingRect(bbox_2)
-        intersect_tl = [max(box_1[0], box_2[0]), max(box_1[1], box_2[1])]
-        intersect_br = [
-            min(box_1[0] + box_1[2], box_2[0] + box_2[2]),
-            min(box_1[1] + box_1[3], box_2[1] + box_2[3]),
-        ]
-
-        if (intersect_br[0] - intersect_tl[0]) > 0 and (
-            intersect_br[1] - intersect_tl[1]
-        ) > 0:
-            intersect = (intersect_br[0] - intersect_tl[0]) * (
-                intersect_br[1] - intersect_tl[1]
-            )
-            union = box_1[2] * box_1[3] + box_2[2] * box_2[3] - intersect
-            iou = intersect / union
-            if iou > iou_thres:
-                return True
-            else:
-                return False
-        else:
-            # print("Fine")
-            return False
+        return geometry.resize_matrix, geometry.resize_vector
+
+    def decode(self, final_pred):
+        """
+        brief:将所有候选的四点坐标一次性还原到原图坐标系，返回 (N, 4, 2) int32。
+        """
+        # 与逐点 matmul 保持一致: 先在 float32 下减去填充偏移, 再乘缩放因子并截断取整
+        pts = final_pred[:, 0:8].reshape(-1, 4, 2) - self.resize_vector.astype(np.float32)
+        return (pts * np.diag(self.resize_matrix)).astype(np.int32)
+
+    @staticmethod
+    def pairwise_iou(pts):
+        """
+        brief:计算 (N, 4, 2) 四点框外接矩形两两之间的 IoU 矩阵 (N, N)。
+        外接矩形与 cv2.boundingRect 对整数点的定义一致(右下角 +1)。
+        """
+        pts = pts.astype(np.int64)
+        tl = pts.min(axis=1)
+        br = pts.max(axis=1) + 1
+        area = np.prod(br - tl, axis=1)
+
+        intersect_wh = np.minimum(br[:, None], br[None]) - np.maximum(tl[:, None], tl[None])
+        is_intersected = np.all(intersect_wh > 0, axis=2)
+        intersect = np.where(is_intersected, np.prod(intersect_wh, axis=2), 0)
+        union = area[:, None] + area[None] - intersect
+        return intersect / union
+
+    def nms(self, pts):
+        """
+        brief:在 IoU 矩阵上做贪心抑制，pts 需按置信度降序排列，返回保留掩码。
+        """
+        overlapped = self.pairwise_iou(pts) > self.nms_thres
+        keep = np.ones(len(pts), dtype=bool)
+        for i in range(len(pts)):
+            if keep[i]:
+                keep[i + 1 :] &= ~overlapped[i, i + 1 :]
+        return keep
 
     def preprocess(self, img):
-        size = self.input.shape
-        # img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        # print(img.shape)
-        self.resize_matrix, self.resize_vector, img_pre = self.resize(img, size)
-        # cv2.imshow("?",img_pre)
-        img_pre = np.expand_dims(img_pre, axis=0)
-        # print(img_pre.shape)
-        img_pre = np.transpose(img_pre, (0, 3, 1, 2))
-        img_pre = img_pre.astype(np.float32)
-        return img_pre
+        """
+        brief:形状为 (1, C, H, W) 的 float32 张量，可直接输入模型。
+        返回的是复用的输入缓冲区，内容会在下一次 preprocess 时被覆盖。
+        """
+        self.resize_matrix, self.resize_vector = self.letterbox(img, self.input_buffer[0])
+        return self.input_buffer
 
     def postprocess(self, final_pred):
-        target_list = []
-        removed_index = np.zeros([self.topk])
-        for i in range(self.topk):
-            pred = final_pred[i]
-            tmp_bbox = BBox()
-            # print(pred)
-            tmp_bbox.conf = pred[8]
-            # print(tmp_bbox.conf)
-            if tmp_bbox.conf < self.conf_thres:
-                break
-            if removed_index[i] == 1:
-                continue
-            # Setting boundingbox
-            tmp_bbox.pts[0] = np.array(
-                np.matmul((pred[0:2] - self.resize_vector), self.resize_matrix),
-                dtype=np.int32,
-            )
-            tmp_bbox.pts[1] = np.array(
-                np.matmul((pred[2:4] - self.resize_vector), self.resize_matrix),
-                dtype=np.int32,
-            )
-            tmp_bbox.pts[2] = np.array(
-                np.matmul((pred[4:6] - self.resize_vector), self.resize_matrix),
-                dtype=np.int32,
-            )
-            tmp_bbox.pts[3] = np.array(
-                np.matmul((pred[6:8] - self.resize_vector), self.resize_matrix),
-                dtype=np.int32,
-            )
+        final_pred = np.asarray(final_pred)
+        if len(final_pred) == 0:
+            return []
+        # topk 已按置信度降序排列，遇到第一个低于阈值的候选即截断
+        below_thres = final_pred[:, 8] < self.conf_thres
+        if below_thres.any():
+            final_pred = final_pred[: np.argmax(below_thres)]
 
-            tmp_bbox.color = int(torch.argmax(pred[9:13]))
-            tmp_bbox.id = int(torch.argmax(pred[13:]))
-
-            for j in range(i + 1, self.topk):
-                tmp_bbox_j = BBox()
-                pred_j = final_pred[j]
-                tmp_bbox_j.conf = pred_j[8]
-
-                if tmp_bbox_j.conf < self.conf_thres:
-                    break
-                if removed_index[j] == 1:
-                    continue
-                tmp_bbox_j.pts[0] = np.array(
-                    np.matmul((pred_j[0:2] - self.resize_vector), self.resize_matrix),
-                    dtype=np.int32,
-                )
-                tmp_bbox_j.pts[1] = np.array(
-                    np.matmul((pred_j[2:4] - self.resize_vector), self.resize_matrix),
-                    dtype=np.int32,
-                )
-                tmp_bbox_j.pts[2] = np.array(
-                    np.matmul((pred_j[4:6] - self.resize_vector), self.resize_matrix),
-                    dtype=np.int32,
-                )
-                tmp_bbox_j.pts[3] = np.array(
-                    np.matmul((pred_j[6:8] - self.resize_vector), self.resize_matrix),
-                    dtype=np.int32,
-                )
-                if self.is_overlapped(tmp_bbox.pts, tmp_bbox_j.pts, self.nms_thres):
-                    removed_index[j] = 1
-                    continue
+        pts = self.decode(final_pred)
+        keep = self.nms(pts)
+        colors = np.argmax(final_pred[:, 9:13], axis=1)
+        ids = np.argmax(final_pred[:, 13:], axis=1)
 
+        target_list = []
+        for i in np.flatnonzero(keep):
+            tmp_bbox = BBox()
+            tmp_bbox.pts = pts[i]
+            tmp_bbox.conf = final_pred[i, 8]
+            tmp_bbox.color = int(colors[i])
+            tmp_bbox.id = int(ids[i])
             target_list.append(tmp_bbox)
-            # print("add")
-        # print(len(target_list))
         return target_list
 
+    def select_topk(self, pred):
+        """
+        brief:先按 conf_thres 过滤，再对剩余候选取前 topk 个并按置信度降序排列。
+        """
+        # 绝大多数帧只有零个或少量候选能通过阈值，后续排序与解码只作用于这些行
+        candidates = pred[pred[:, 8] >= self.conf_thres]
+        candidates_conf = candidates[:, 8]
+        if len(candidates) > self.topk:
+            # argpartition 只保证前 k 个是最大的 k 个，第 k 名并列时选中哪个不确定，
+            # 因此取出所有不低于第 k 名的候选，排序后再截断
+            kth = candidates_conf[np.argpartition(-candidates_conf, self.topk - 1)[self.topk - 1]]
+            pred_topk_index = np.flatnonzero(candidates_conf >= kth)
+        else:
+            pred_topk_index = np.arange(len(candidates))
+        # 置信度降序，并列时按候选顺序，结果与平台和排序算法无关
+        order = np.lexsort((pred_topk_index, -candidates_conf[pred_topk_index]))
+        pred_topk_index = pred_topk_index[order][: self.topk]
+        # axis=0：按行（预测结果维度）提取
+        return np.take(candidates, pred_topk_index, axis=0)
+
+    def bind_io(self):
+        """
+        brief:开启 IO binding。每个分块的绑定在第一次推理时建立，之后直接复用，
+        只有 batch 输入/输出缓冲区重新分配时才重建，每帧推理不再分配 OrtValue 与输出数组。
+        """
+        if not all(isinstance(dim, int) for dim in self.output.shape[1:]):
+            print("[WARN] Model output shape is dynamic, IO binding disabled.")
+            return
+        self.use_io_binding = True
+
+    def get_binding(self, start, size):
+        """
+        brief:返回 batch_buffer[start:start+size] -> batch_output_buffer[start:start+size] 的绑定。
+        """
+        key = (start, size)
+        if key not in self.bindings:
+            # OrtValue 直接引用 numpy 缓冲区的内存，需与绑定一起保持引用
+            bound_input = rt.OrtValue.ortvalue_from_numpy(self.batch_buffer[start : start + size])
+            bound_output = rt.OrtValue.ortvalue_from_numpy(self.batch_output_buffer[start : start + size])
+            binding = self.model.io_binding()
+            binding.bind_ortvalue_input(self.input.name, bound_input)
+            binding.bind_ortvalue_output(self.output.name, bound_output)
+            self.bindings[key] = (binding, bound_input, bound_output)
+        return self.bindings[key][0]
+
     def infer(self, img):
-        img_pre = self.preprocess(img)
-        pred = self.model.run([self.output.name], {self.input.name: img_pre})
-        pred_tensor = torch.as_tensor(pred[0][0])
-        # print(pred_tensor.shape)
-        pred_conf = pred_tensor[:, 8]
-        pred_topk_index = torch.topk(pred_conf, k=self.topk, sorted=True).indices
-        final_pred = torch.index_select(pred_tensor, dim=0, index=pred_topk_index)
-        return self.postprocess(final_pred)
+        return self.infer_batch([img])[0]
+
+    def run_batch(self, num_frames):
+        """
+        brief:对 batch_buffer 的前 num_frames 帧推理，返回 (num_frames, num_anchors, num_attrs) 的预测。
+        固定 batch 维的模型按 self.batch_size 分块，batch_buffer 已按整块分配，最后一块多出的行不计入结果。
+        IO binding 模式下各块复用缓存的绑定，预测直接写入持久的 batch_output_buffer。
+        """
+        chunk_size = self.batch_size or num_frames
+        if self.use_io_binding:
+            for start in range(0, num_frames, chunk_size):
+                self.model.run_with_iobinding(self.get_binding(start, chunk_size))
+            return self.batch_output_buffer[:num_frames]
+
+        preds = []
+        for start in range(0, num_frames, chunk_size):
+            chunk = self.batch_buffer[start : start + chunk_size]
+            preds.append(self.model.run([self.output.name], {self.input.name: chunk})[0])
+        return np.concatenate(preds)[:num_frames]
+
+    def infer_batch(self, frames):
+        """
+        brief:将多帧图像 letterbox 到同一个 NCHW 张量中一次推理，返回每帧的检测结果列表。
+        """
+        if len(frames) == 0:
+            return []
+        chunk_size = self.batch_size or len(frames)
+        num_rows = -(-len(frames) // chunk_size) * chunk_size
+        if self.batch_buffer is None or len(self.batch_buffer) < num_rows:
+            self.batch_buffer = np.zeros((num_rows, *self.input.shape[1:]), dtype=np.float32)
+            if self.use_io_binding:
+                self.batch_output_buffer = np.empty((num_rows, *self.output.shape[1:]), dtype=np.float32)
+                # 缓冲区重新分配后旧的绑定指向已释放的内存，全部重建
+                self.bindings = {}
+        batch = self.batch_buffer[: len(frames)]
+        geometry = []
+        for i, img in enumerate(frames):
+            with self.timer.measure("preprocess"):
+                geometry.append(self.letterbox(img, batch[i]))
+
+        start = time.perf_counter()
+        preds = self.run_batch(len(frames))
+        # 一次 batch 推理的耗时由其中各帧均摊
+        self.timer.add("ort_run", time.perf_counter() - start, count=len(frames))
+
+        target_lists = []
+        for pred, (self.resize_matrix, self.resize_vector) in zip(preds, geometry):
+            with self.timer.measure("postprocess"):
+                target_lists.append(self.postprocess(self.select_topk(pred)))
+        return target_lists
+
+
+class Letterbox:
+    def __init__(self, resize_matrix, resize_vector, resized):
+        self.resize_matrix = resize_matrix
+        self.resize_vector = resize_vector  # [padding_left, padding_top]
+        self.resized = resized  # 预分配的缩放结果 (h, w, 3) uint8
 
 
 class BBox:
@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+
+from quality_gate import thumbnail
+
+# 送推理的原因，汇总时按此顺序输出
+ACCEPT_REASONS = ["first", "motion", "max_stride"]
+
+
+class MotionSampler:
+    def __init__(self, threshold=0.005, samples_per_min=60.0, max_stride=0, thumb_width=160, pixel_thres=20, burst_seconds=10.0):
+        """
+        brief:按画面变化自适应采样。候选帧(每 --skip_frames+1 帧一个，即最小步长)与上一个送推理帧的
+        灰度缩略图相比，灰度差超过 pixel_thres 的像素比例不小于 threshold 时才送推理。
+        按变化面积而不是整幅平均差判断，画面中小目标的运动不会被大面积静止背景稀释；
+        静止画面不会重复采样，缓慢变化会累积到阈值。
+        samples_per_min 为令牌桶预算(每分钟最多送推理的帧数，可短时突发 burst_seconds 秒的额度)，0 表示不限。
+        距上一个送推理帧达到 max_stride 帧时强制采样(不受预算限制)，0 表示不强制。
+        """
+        self.threshold = threshold
+        self.rate = samples_per_min / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.max_stride = max_stride
+        self.thumb_width = thumb_width
+        self.pixel_thres = pixel_thres
+        self.counts = dict.fromkeys(ACCEPT_REASONS, 0)
+        self.num_candidates = 0
+        self.num_static = 0  # 变化不足未送推理
+        self.num_over_budget = 0  # 变化足够但预算用尽
+        self.reset()
+
+    def reset(self):
+        """
+        brief:开始新的视频(或分段/实时流)，下一帧总是送推理。
+        """
+        self.last_thumb = None
+        self.last_idx = None
+        self.last_time = None
+        self.tokens = self.capacity
+
+    def blurred_thumbnail(self, frame):
+        # 抑制压缩噪声与传感器噪声，避免静止画面的差分被噪声抬高
+        return cv2.GaussianBlur(thumbnail(frame, self.thumb_width), (3, 3), 0)
+
+    def difference(self, thumb):
+        if thumb.shape != self.last_thumb.shape:
+            return float("inf")
+        changed = cv2.absdiff(thumb, self.last_thumb) > self.pixel_thres
+        return np.count_nonzero(changed) / changed.size
+
+    def accept(self, frame, frame_idx, timestamp):
+        """
+        brief:判断第 frame_idx 帧是否送推理，timestamp 为该帧的时间(秒)，用于按预算补充令牌。
+        """
+        self.num_candidates += 1
+        if self.last_time is not None and self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + max(0.0, timestamp - self.last_time) * self.rate)
+        self.last_time = timestamp
+
+        thumb = self.blurred_thumbnail(frame)
+        if self.last_thumb is None:
+            reason = "first"
+        elif self.max_stride and frame_idx - self.last_idx >= self.max_stride:
+            reason = "max_stride"
+        elif self.difference(thumb) < self.threshold:
+            self.num_static += 1
+            return False
+        elif self.rate > 0 and self.tokens < 1:
+            self.num_over_budget += 1
+            return False
+        else:
+            reason = "motion"
+
+        self.counts[reason] += 1
+        self.tokens = max(0.0, self.tokens - 1)
+        self.last_thumb = thumb
+        self.last_idx = frame_idx
+        return True
+
+    @property
+    def num_accepted(self):
+        return sum(self.counts.values())
+
+    def pop_stats(self):
+        stats = {"candidates": self.num_candidates, "static": self.num_static, "over_budget": self.num_over_budget, **self.counts}
+        self.counts = dict.fromkeys(ACCEPT_REASONS, 0)
+        self.num_candidates = self.num_static = self.num_over_budget = 0
+        return stats
+
+    def merge_stats(self, stats):
+        self.num_candidates += stats["candidates"]
+        self.num_static += stats["static"]
+        self.num_over_budget += stats["over_budget"]
+        for reason in ACCEPT_REASONS:
+            self.counts[reason] += stats[reason]
+
+    def summary(self):
+        return (
+            f"运动采样: 候选 {self.num_candidates} 帧, 送推理 {self.num_accepted} 帧 "
+            f"(首帧 {self.counts['first']}, 画面变化 {self.counts['motion']}, 达到最大步长 {self.counts['max_stride']}), "
+            f"变化不足 {self.num_static}, 超出预算 {self.num_over_budget}"
+        )
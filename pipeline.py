@@ -0,0 +1,474 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import cv2
+
+# 解码线程结束标记
+END = object()
+
+
+def put_until_stopped(q, item, stop_event, timeout=0.1):
+    """
+    brief:向有界队列放入 item，队列满时阻塞(背压)，stop_event 置位后放弃并返回 False。
+    """
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=timeout)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+# 跳帧方式: grab 只解封装不解码出图像; seek 直接按帧号跳到下一采样帧
+SKIP_MODES = ["grab", "seek"]
+
+
+def blank_block(skip_blank, frame_interval):
+    """
+    brief:黑白屏跳过的块大小，为不超过 skip_blank 的最大采样间隔整数倍，0 表示不跳过。
+    块边界为该值整数倍的绝对帧序号，视频分段也按此对齐。
+    """
+    return skip_blank // frame_interval * frame_interval
+
+
+class FrameSampler:
+    def __init__(
+        self,
+        cap,
+        frame_interval=1,
+        start=0,
+        end=None,
+        mode="grab",
+        timer=None,
+        motion=None,
+        blank_fn=None,
+        skip_blank=0,
+        reopen=None,
+    ):
+        """
+        brief:从第 start 帧(cap 已定位于此)开始，只对 frame_idx % frame_interval == 0 的帧
+        解码出图像，迭代得到 (frame_idx, frame)，frame_idx 为真实帧序号。
+        mode 为 grab 时跳过的帧只调用 cap.grab()，为 seek 时通过 CAP_PROP_POS_FRAMES 跳到下一采样帧，
+        seek 位置不准确时退回 grab。num_read 为已经过的帧数，用于进度显示。
+        motion 为 MotionSampler 时，解码出的候选帧还需画面变化足够才会产出。
+        blank_fn(frame) 判断黑白屏，skip_blank > 0 时黑白屏之后的帧按 _skip_blank 跳过。
+        reopen() 返回重新打开、位于第 0 帧的 cap，需要回退而 seek 不可用时据此重新 grab 到目标帧。
+        """
+        if mode not in SKIP_MODES:
+            raise ValueError(f"Unknown frame skip mode '{mode}', available: {SKIP_MODES}")
+        self.cap = cap
+        self.frame_interval = frame_interval
+        self.start = start
+        self.end = end
+        self.mode = mode
+        self.timer = timer
+        self.motion = motion
+        self.blank_fn = blank_fn
+        self.block = blank_block(skip_blank, frame_interval) if blank_fn is not None else 0
+        self.reopen = reopen
+        self.reopened = False
+        self.pos = start  # cap 的当前位置，即下一次 read 得到的帧序号
+        self.num_read = 0
+        self.num_blank_skipped = 0
+        if motion is not None:
+            # 帧率未知时按 30fps 计算预算
+            self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            motion.reset()
+
+    def _timed(self, stage, fn):
+        if self.timer is None:
+            return fn()
+        with self.timer.measure(stage):
+            return fn()
+
+    def _accept(self, frame_idx, frame):
+        if self.motion is None:
+            return True
+        if self.timer is None:
+            return self.motion.accept(frame, frame_idx, frame_idx / self.fps)
+        with self.timer.measure("motion"):
+            return self.motion.accept(frame, frame_idx, frame_idx / self.fps)
+
+    def _is_blank(self, frame):
+        return self._timed("quality_gate", lambda: self.blank_fn(frame))
+
+    def _skip(self, frame_idx, num_frames):
+        """
+        brief:跳过 num_frames 帧，返回实际跳过的帧数(视频结束时可能更少)。
+        """
+        skipped = 0
+        if self.mode == "seek" and num_frames > 1:
+            target = frame_idx + num_frames
+            if self._timed("grab", lambda: self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)):
+                pos = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+                if pos == target:
+                    return num_frames
+                if pos > target:
+                    # 越过了目标帧，回到 frame_idx 后改用 grab
+                    print(f"[WARN] Seek to frame {target} overshot to {pos}, falling back to grab.")
+                    self.mode = "grab"
+                    self._reposition(frame_idx)
+                else:
+                    skipped = pos - frame_idx
+            if self.mode == "seek":
+                # 不支持精确 seek 的后端，剩余帧及之后全部改用 grab
+                print("[WARN] Inaccurate seek, falling back to grab.")
+                self.mode = "grab"
+        while skipped < num_frames:
+            if not self._timed("grab", self.cap.grab):
+                break
+            skipped += 1
+        return skipped
+
+    def _reposition(self, frame_idx):
+        """
+        brief:回到第 frame_idx 帧。seek 模式下按帧号 seek 并校验，位置不准确或已退回 grab 时
+        重新打开视频并 grab 到该帧。
+        """
+        if self.mode == "seek":
+            self._timed("grab", lambda: self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx))
+            if int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_idx:
+                self.pos = frame_idx
+                return
+            print("[WARN] Inaccurate seek, falling back to grab.")
+            self.mode = "grab"
+        if self.reopen is None:
+            raise RuntimeError(f"Cannot go back to frame {frame_idx} without reopening the video")
+        self.cap.release()
+        self.cap = self.reopen()
+        self.reopened = True
+        for pos in range(frame_idx):
+            if not self._timed("grab", self.cap.grab):
+                raise RuntimeError(f"Video ended at frame {pos} while reopening to frame {frame_idx}")
+        self.pos = frame_idx
+
+    def _update_read(self):
+        num_read = self.pos - self.start
+        if self.end is not None:
+            # 黑白屏检测可能读到范围外的边界帧
+            num_read = min(num_read, self.end - self.start)
+        self.num_read = max(self.num_read, num_read)
+
+    def _read_at(self, frame_idx):
+        """
+        brief:前进到第 frame_idx 帧并解码，视频结束时返回 None。
+        """
+        if frame_idx > self.pos:
+            self.pos += self._skip(self.pos, frame_idx - self.pos)
+            self._update_read()
+            if self.pos < frame_idx:
+                return None
+        ret, frame = self._timed("decode", self.cap.read)
+        if not ret:
+            return None
+        self.pos += 1
+        self._update_read()
+        return frame
+
+    def _read_range(self, first, last):
+        frames = []
+        for frame_idx in range(first, last + 1, self.frame_interval):
+            frame = self._read_at(frame_idx)
+            if frame is None:
+                break
+            frames.append((frame_idx, frame))
+        return frames
+
+    def _in_range(self, frames):
+        return [item for item in frames if self.end is None or item[0] < self.end]
+
+    def _skip_blank(self, frame_idx):
+        """
+        brief:块边界 frame_idx(block 的整数倍)为黑白屏时检测下一个块边界帧:
+        也是黑白屏则跳过两者之间的帧，否则黑白屏在块内结束，块内的帧照常产出，不会丢掉其后的内容。
+        块按绝对帧序号划分，是否跳过只取决于块两端的画面，与批大小、流水线和(按块对齐的)分段无关；
+        范围末尾的块边界帧属于下一段，只用于判断，不产出。
+        返回 (接下来要产出的帧, 下一个块边界是否为黑白屏)。
+        """
+        boundary = frame_idx + self.block
+        first = frame_idx + self.frame_interval
+        if self.mode == "seek":
+            # 直接 seek 到边界帧，块内的帧只在需要时才回退解码
+            frame = self._read_at(boundary)
+            if frame is not None and self._is_blank(frame):
+                self.num_blank_skipped += (boundary - first) // self.frame_interval
+                return self._in_range([(boundary, frame)]), True
+            self._reposition(first)
+            return self._in_range(self._read_range(first, boundary)), False
+        frames = self._read_range(first, boundary)
+        if frames and frames[-1][0] == boundary and self._is_blank(frames[-1][1]):
+            self.num_blank_skipped += len(frames) - 1
+            return self._in_range(frames[-1:]), True
+        return self._in_range(frames), False
+
+    def _frames(self):
+        frame_idx = -(-self.start // self.frame_interval) * self.frame_interval
+        while self.end is None or frame_idx < self.end:
+            frame = self._read_at(frame_idx)
+            if frame is None:
+                return
+            if self._accept(frame_idx, frame):
+                yield frame_idx, frame
+            if self.block > 0 and frame_idx % self.block == 0 and self._is_blank(frame):
+                # 连续的黑白屏只提示一次
+                print(f"[WARN] Blank screen detected at frame {frame_idx}, skipping blank frames in steps of {self.block}.")
+                blank = True
+                while blank and (self.end is None or frame_idx < self.end):
+                    frames, blank = self._skip_blank(frame_idx)
+                    for item in frames:
+                        if self._accept(*item):
+                            yield item
+                    frame_idx += self.block
+            # 下一个采样帧
+            frame_idx = -(-self.pos // self.frame_interval) * self.frame_interval
+        # 范围末尾不需要采样的帧无需读取
+        self.num_read = self.end - self.start
+
+    def __iter__(self):
+        try:
+            yield from self._frames()
+        finally:
+            # 重新打开的 cap 由 FrameSampler 负责释放
+            if self.reopened:
+                self.cap.release()
+
+
+class FrameReader(threading.Thread):
+    def __init__(
+        self,
+        cap,
+        frame_interval=1,
+        queue_size=32,
+        timer=None,
+        start=0,
+        end=None,
+        mode="grab",
+        motion=None,
+        blank_fn=None,
+        skip_blank=0,
+        reopen=None,
+    ):
+        """
+        brief:解码线程，按 frame_interval 采样后将 (frame_idx, frame) 放入有界队列。
+        cap 已定位到第 start 帧，读到第 end 帧(不含)或视频结尾时结束，frame_idx 为真实帧序号。
+        黑白屏跳过在解码线程中由 FrameSampler 完成。
+        """
+        super().__init__(daemon=True)
+        self.sampler = FrameSampler(
+            cap, frame_interval, start, end, mode, timer, motion, blank_fn, skip_blank, reopen
+        )
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.error = None
+
+    @property
+    def num_read(self):
+        return self.sampler.num_read
+
+    def run(self):
+        timer = self.sampler.timer
+        try:
+            for frame_idx, frame in self.sampler:
+                # 本帧在解码线程中的耗时(grab/decode/motion)随帧一起交给推理线程，计入同一条逐帧记录
+                record = timer.take_frame() if timer is not None else None
+                if not put_until_stopped(self.frames, (frame_idx, frame, record), self.stop_event):
+                    break
+        except Exception as e:
+            self.error = e
+        finally:
+            put_until_stopped(self.frames, END, self.stop_event)
+
+    def batches(self, batch_size):
+        """
+        brief:按 batch_size 从队列中取出采样帧，读到结束标记后返回剩余不足一个 batch 的帧。
+        """
+        batch = []
+        timer = self.sampler.timer
+        while True:
+            item = self.frames.get()
+            if item is END:
+                break
+            frame_idx, frame, record = item
+            if timer is not None:
+                timer.merge_frame(record)
+            batch.append((frame_idx, frame))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        self.stop_event.set()
+        # 清空队列，让阻塞在 put 上的解码线程尽快退出
+        while self.is_alive():
+            try:
+                self.frames.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self.join()
+
+
+class ImageLoader:
+    def __init__(self, paths, num_workers=4, prefetch=32, timer=None):
+        """
+        brief:按顺序惰性读取图片，线程池最多提前解码 prefetch 张，迭代得到 (path, img)。
+        读取失败的图片 img 为 None。
+        """
+        self.paths = list(paths)
+        self.prefetch = prefetch
+        self.timer = timer
+        self.executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="reader")
+        self.pending = deque()  # 已提交、尚未取走的 (path, future)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _read(self, path):
+        """
+        brief:在线程池中读取一张图片，返回 (img, 本线程记录的逐帧耗时)。
+        """
+        if self.timer is None:
+            return cv2.imread(str(path)), None
+        with self.timer.measure("decode"):
+            img = cv2.imread(str(path))
+        return img, self.timer.take_frame()
+
+    def __iter__(self):
+        paths = iter(self.paths)
+        pending = self.pending
+        for path in paths:
+            pending.append((path, self.executor.submit(self._read, path)))
+            if len(pending) >= self.prefetch:
+                break
+        while pending:
+            path, future = pending.popleft()
+            # 取走一张的同时补充一张，内存中最多 prefetch 张已解码图片
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, self.executor.submit(self._read, next_path)))
+            img, record = future.result()
+            if self.timer is not None:
+                # 解码耗时计入迭代方(推理线程)当前帧的逐帧记录
+                self.timer.merge_frame(record)
+            yield path, img
+
+    def close(self):
+        # shutdown 的 cancel_futures 参数需要 Python 3.9，这里手动取消尚未开始的读取
+        for _, future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=True)
+
+
+class WriterPool:
+    def __init__(self, save_fn, num_workers=4, queue_size=32):
+        """
+        brief:写盘线程池，最多 queue_size 个任务排队或执行中，超出时 submit 阻塞(背压)。
+        save_fn 返回写入的字节数，用于统计。
+        """
+        self.save_fn = save_fn
+        self.queue_size = queue_size
+        self.executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="writer")
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.lock = threading.Lock()
+        self.futures = []
+        self.error = None
+        self.depth = 0  # 当前排队或执行中的任务数
+        self.max_depth = 0
+        self.num_saved = 0
+        self.bytes_written = 0
+
+    def submit(self, *args):
+        """
+        brief:提交一个写盘任务。之前的任务已失败时先抛出该异常，长时间不 flush 的实时模式也能及时发现写盘错误。
+        """
+        self.raise_error()
+        self.slots.acquire()
+        with self.lock:
+            self.depth += 1
+            self.max_depth = max(self.max_depth, self.depth)
+        try:
+            future = self.executor.submit(self._run, *args)
+        except BaseException:
+            with self.lock:
+                self.depth -= 1
+            self.slots.release()
+            raise
+        with self.lock:
+            self.futures.append(future)
+            # 长时间不 flush 时(如实时模式)定期清理已完成的任务
+            if len(self.futures) > 2 * self.queue_size:
+                self.futures = [f for f in self.futures if not f.done()]
+
+    def _run(self, *args):
+        """
+        brief:执行一个写盘任务。异常只记录在 self.error(保留第一个)，不留在 future 上，
+        由 raise_error/flush 抛出一次后即清除。
+        """
+        try:
+            num_bytes = self.save_fn(*args)
+            with self.lock:
+                self.num_saved += 1
+                self.bytes_written += num_bytes or 0
+        except Exception as e:
+            with self.lock:
+                if self.error is None:
+                    self.error = e
+        finally:
+            with self.lock:
+                self.depth -= 1
+            self.slots.release()
+
+    def raise_error(self):
+        """
+        brief:有写盘任务失败时抛出第一个异常并清除，之后的任务不受影响。
+        """
+        with self.lock:
+            error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def flush(self, discard_errors=False):
+        """
+        brief:等待已提交的写盘任务全部完成，期间有任务失败时抛出第一个异常。
+        discard_errors 为 True 时只等待并丢弃异常，用于视频已经失败时，避免其剩余任务的错误算到下一个视频上。
+        """
+        with self.lock:
+            futures, self.futures = self.futures, []
+        wait(futures)
+        if discard_errors:
+            with self.lock:
+                self.error = None
+            return
+        self.raise_error()
+
+    def pop_stats(self):
+        """
+        brief:取出并清空写盘统计，用于将 worker 进程的统计汇总到主进程。
+        """
+        with self.lock:
+            stats = {"num_saved": self.num_saved, "bytes_written": self.bytes_written, "max_depth": self.max_depth}
+            self.num_saved = self.bytes_written = self.max_depth = 0
+        return stats
+
+    def merge_stats(self, stats):
+        with self.lock:
+            self.num_saved += stats["num_saved"]
+            self.bytes_written += stats["bytes_written"]
+            self.max_depth = max(self.max_depth, stats["max_depth"])
+
+    def summary(self):
+        with self.lock:
+            return (
+                f"写盘: {self.num_saved} 帧, {self.bytes_written / 1024 ** 2:.1f} MB, "
+                f"最大队列深度 {self.max_depth}/{self.queue_size}"
+            )
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
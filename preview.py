@@ -0,0 +1,87 @@
+import time
+import threading
+
+import cv2
+import numpy as np
+
+
+class Preview(threading.Thread):
+    def __init__(self, max_fps=10, max_width=960, window="Preview"):
+        """
+        brief:预览线程，只保留最新提交的一帧，按不超过 max_fps 的频率缩放到 max_width 宽后绘制显示。
+        submit 不会阻塞标注流程，所有 GUI 调用都在本线程中进行。
+        """
+        super().__init__(daemon=True)
+        self.interval = 1.0 / max_fps
+        self.max_width = max_width
+        self.window = window
+        self.lock = threading.Lock()
+        self.latest = None
+        self.new_frame = threading.Event()
+        self.stop_event = threading.Event()
+        self.num_submitted = 0
+        self.num_shown = 0
+
+    def submit(self, frame, detections):
+        """
+        brief:提交一帧及其检测结果，覆盖尚未显示的上一帧。frame 之后不会被修改，这里不做拷贝。
+        """
+        if self.stop_event.is_set():
+            return
+        pts = [np.asarray(det.pts, dtype=np.float32) for det in detections]
+        texts = [f"ID:{det.id} Conf:{det.conf:.2f}" for det in detections]
+        with self.lock:
+            self.latest = (frame, pts, texts)
+            self.num_submitted += 1
+        self.new_frame.set()
+
+    def _draw(self, frame, pts, texts):
+        scale = min(1.0, self.max_width / frame.shape[1])
+        if scale < 1.0:
+            display_frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            display_frame = frame.copy()
+        color = (0, 255, 0)  # BGR
+        for det_pts, text in zip(pts, texts):
+            det_pts = (det_pts * scale).reshape((-1, 1, 2)).astype(np.int32)
+            cv2.polylines(display_frame, [det_pts], True, color, 2)
+            cv2.putText(
+                display_frame,
+                text,
+                (det_pts[0][0][0], det_pts[0][0][1] - 10),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                color,
+                1,
+            )
+        return display_frame
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                if not self.new_frame.wait(timeout=0.1):
+                    cv2.waitKey(1)
+                    continue
+                start = time.perf_counter()
+                with self.lock:
+                    latest, self.latest = self.latest, None
+                    self.new_frame.clear()
+                if latest is not None:
+                    cv2.imshow(self.window, self._draw(*latest))
+                    self.num_shown += 1
+                cv2.waitKey(1)
+                # 限制刷新率，期间提交的帧只保留最新一帧
+                self.stop_event.wait(max(0.0, self.interval - (time.perf_counter() - start)))
+        except cv2.error as e:
+            # 无显示环境(如服务器)下关闭预览，不影响标注
+            print(f"[WARN] Preview disabled: {e}")
+            self.stop_event.set()
+            return
+        try:
+            cv2.destroyWindow(self.window)
+        except cv2.error:
+            pass
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
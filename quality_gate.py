@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+
+# 不合格帧的原因，汇总时按此顺序输出
+REASONS = ["blank", "blurry", "overexposed"]
+
+
+def thumbnail(frame, width):
+    """
+    brief:将帧等比缩放到宽 width(不放大)并转为灰度，质量检测、运动采样与去重共用。
+    """
+    h, w = frame.shape[:2]
+    if w > width:
+        # 缩小倍数很大时 INTER_LINEAR 只访问少量像素，比整帧转灰度快两个数量级
+        size = (width, max(1, round(h * width / w)))
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+
+class QualityGate:
+    def __init__(self, thumb_width=160, blank_var=10.0, blur_thres=0.0, overexposed_ratio=1.0, overexposed_level=250):
+        """
+        brief:在缩略图上对帧做质量评估，推理前剔除不合格的帧:
+        blank: 灰度方差小于 blank_var 的纯色画面(黑屏/白屏/转场)
+        blurry: 拉普拉斯方差小于 blur_thres 的模糊画面，blur_thres 为 0 时不检测
+        overexposed: 亮度不低于 overexposed_level 的像素比例超过 overexposed_ratio，为 1 时不检测
+        缩略图按 thumb_width 等比缩放，阈值均在缩略图上计算。
+        """
+        self.thumb_width = thumb_width
+        self.blank_var = blank_var
+        self.blur_thres = blur_thres
+        self.overexposed_ratio = overexposed_ratio
+        self.overexposed_level = overexposed_level
+        self.counts = dict.fromkeys(REASONS, 0)
+        self.num_checked = 0
+        self.num_skipped = 0  # 黑白屏区间内未经检测直接跳过的帧
+
+    def score(self, frame):
+        """
+        brief:返回缩略图的 (亮度均值, 亮度方差, 拉普拉斯方差, 过曝像素比例)。
+        """
+        gray = thumbnail(frame, self.thumb_width)
+        mean, std = cv2.meanStdDev(gray)
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var()) if self.blur_thres > 0 else 0.0
+        overexposed = float(np.count_nonzero(gray >= self.overexposed_level)) / gray.size
+        return float(mean[0, 0]), float(std[0, 0]) ** 2, sharpness, overexposed
+
+    def is_blank(self, frame):
+        """
+        brief:只判断是否为黑白屏，不计入统计，供解码线程跳过黑白屏使用。
+        """
+        _, std = cv2.meanStdDev(thumbnail(frame, self.thumb_width))
+        return float(std[0, 0]) ** 2 < self.blank_var
+
+    def check(self, frame):
+        """
+        brief:返回不合格原因(REASONS 之一)，合格时返回 None。
+        """
+        self.num_checked += 1
+        mean, var, sharpness, overexposed = self.score(frame)
+        reason = None
+        if var < self.blank_var:
+            reason = "blank"
+        elif self.blur_thres > 0 and sharpness < self.blur_thres:
+            reason = "blurry"
+        elif overexposed > self.overexposed_ratio:
+            reason = "overexposed"
+        if reason is not None:
+            self.counts[reason] += 1
+        return reason
+
+    def pop_stats(self):
+        stats = {"checked": self.num_checked, "skipped": self.num_skipped, **self.counts}
+        self.counts = dict.fromkeys(REASONS, 0)
+        self.num_checked = self.num_skipped = 0
+        return stats
+
+    def merge_stats(self, stats):
+        self.num_checked += stats["checked"]
+        self.num_skipped += stats["skipped"]
+        for reason in REASONS:
+            self.counts[reason] += stats[reason]
+
+    def summary(self):
+        rejected = ", ".join(f"{reason} {self.counts[reason]}" for reason in REASONS)
+        return f"质量检测: 检测 {self.num_checked} 帧, 剔除 {rejected}, 黑屏后跳过 {self.num_skipped} 帧"
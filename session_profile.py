@@ -0,0 +1,191 @@
+import os
+import time
+import json
+import hashlib
+import platform
+import argparse
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as rt
+import yaml
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": rt.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": rt.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": rt.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": rt.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+EXECUTION_MODES = {
+    "sequential": rt.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": rt.ExecutionMode.ORT_PARALLEL,
+}
+PROFILE_KEYS = {
+    "providers",
+    "graph_optimization_level",
+    "execution_mode",
+    "intra_op_num_threads",
+    "inter_op_num_threads",
+    "enable_cpu_mem_arena",
+    "enable_mem_pattern",
+    "allow_spinning",
+}
+
+
+def load_profiles(cfg="session_cfg.yaml"):
+    with open(cfg, "r", encoding="utf-8") as f:
+        profiles = yaml.load(f.read(), yaml.FullLoader)
+    for name, profile in profiles.items():
+        unknown = set(profile or {}) - PROFILE_KEYS
+        if unknown:
+            raise ValueError(f"Unknown keys in session profile '{name}': {sorted(unknown)}")
+    return profiles
+
+
+def load_profile(name, cfg="session_cfg.yaml"):
+    profiles = load_profiles(cfg)
+    if name not in profiles:
+        raise ValueError(f"Session profile '{name}' not found in {cfg}, available: {list(profiles)}")
+    return profiles[name] or {}
+
+
+def build_session_options(profile):
+    """
+    brief:由会话配置字典生成 rt.SessionOptions，未给出的字段保持默认值。
+    """
+    options = rt.SessionOptions()
+    if "graph_optimization_level" in profile:
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[profile["graph_optimization_level"]]
+    if "execution_mode" in profile:
+        options.execution_mode = EXECUTION_MODES[profile["execution_mode"]]
+    if "intra_op_num_threads" in profile:
+        options.intra_op_num_threads = profile["intra_op_num_threads"]
+    if "inter_op_num_threads" in profile:
+        options.inter_op_num_threads = profile["inter_op_num_threads"]
+    if "enable_cpu_mem_arena" in profile:
+        options.enable_cpu_mem_arena = profile["enable_cpu_mem_arena"]
+    if "enable_mem_pattern" in profile:
+        options.enable_mem_pattern = profile["enable_mem_pattern"]
+    if "allow_spinning" in profile:
+        # 线程池空闲时是否自旋等待，多进程部署时自旋会互相抢占核心
+        spinning = "1" if profile["allow_spinning"] else "0"
+        options.add_session_config_entry("session.intra_op.allow_spinning", spinning)
+        options.add_session_config_entry("session.inter_op.allow_spinning", spinning)
+    return options
+
+
+# 缓存中最多保存 extended 级别的优化结果。all 级别的布局优化(NCHWc)按本机指令集(AVX2/AVX-512)选择分块大小，
+# 序列化后只能在相同环境使用，改为每次加载缓存时按配置的级别在本机重新应用
+MAX_CACHED_OPTIMIZATION_LEVEL = rt.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+
+
+def cache_path(model_pth, profile, providers, cache_dir):
+    """
+    brief:优化后模型的缓存路径，由模型文件哈希、onnxruntime 版本、CPU 架构和会话配置共同决定。
+    """
+    with open(model_pth, "rb") as f:
+        model_hash = hashlib.sha256(f.read()).hexdigest()
+    options = json.dumps({"profile": profile, "providers": providers}, sort_keys=True)
+    key = "|".join([model_hash, rt.__version__, platform.machine(), options])
+    key_hash = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return Path(cache_dir) / f"{Path(model_pth).stem}_{key_hash}.onnx"
+
+
+def create_session(model_pth, profile=None, providers=None, cache_dir=None):
+    """
+    brief:按会话配置创建 rt.InferenceSession，profile 为 None 时与旧版本行为一致。
+    providers 为模型默认的执行后端，可被 profile 中的 providers 覆盖。
+    给出 cache_dir 时，首次运行将至多 extended 级别优化后的图写入缓存，之后加载缓存时只需在本机
+    应用剩余的、与硬件相关的优化(配置为 all 时)，缓存可以在不同指令集的机器间共享。
+    """
+    profile = profile or {}
+    providers = profile.get("providers", providers)
+    kwargs = {} if providers is None else {"providers": providers}
+    if cache_dir is None:
+        return rt.InferenceSession(model_pth, build_session_options(profile), **kwargs)
+
+    cached_model = cache_path(model_pth, profile, providers, cache_dir)
+    if cached_model.exists():
+        try:
+            return rt.InferenceSession(str(cached_model), build_session_options(profile), **kwargs)
+        except Exception as e:
+            print(f"[WARN] Failed to load cached model {cached_model}: {e}, rebuilding.")
+            cached_model.unlink(missing_ok=True)
+
+    cached_model.parent.mkdir(parents=True, exist_ok=True)
+    # 多个 worker 可能同时写缓存，先写入各自的临时文件再原子替换
+    tmp_model = cached_model.with_suffix(f".{os.getpid()}.tmp")
+    options = build_session_options(profile)
+    level = options.graph_optimization_level
+    if int(level) > int(MAX_CACHED_OPTIMIZATION_LEVEL):
+        options.graph_optimization_level = MAX_CACHED_OPTIMIZATION_LEVEL
+    options.optimized_model_filepath = str(tmp_model)
+    session = rt.InferenceSession(model_pth, options, **kwargs)
+    if not tmp_model.exists():
+        return session
+    os.replace(tmp_model, cached_model)
+    if int(level) <= int(MAX_CACHED_OPTIMIZATION_LEVEL):
+        return session
+    # 写缓存用的会话缺少硬件相关优化，按配置的级别重新加载
+    return rt.InferenceSession(str(cached_model), build_session_options(profile), **kwargs)
+
+
+def benchmark(model_pth, profile, num_frames=200, num_warmup=10, batch_size=1):
+    """
+    brief:用随机输入测量某一会话配置下 session.run 的单帧延迟与吞吐。
+    """
+    session = create_session(model_pth, profile, providers=["CUDAExecutionProvider", "CPUExecutionProvider"])
+    model_input = session.get_inputs()[0]
+    output = session.get_outputs()[0]
+    if isinstance(model_input.shape[0], int):
+        batch_size = model_input.shape[0]
+    shape = (batch_size, *model_input.shape[1:])
+    img = np.random.default_rng(0).uniform(0, 255, shape).astype(np.float32)
+
+    for _ in range(num_warmup):
+        session.run([output.name], {model_input.name: img})
+
+    latency = []
+    num_runs = max(1, num_frames // batch_size)
+    for _ in range(num_runs):
+        start = time.perf_counter()
+        session.run([output.name], {model_input.name: img})
+        latency.append((time.perf_counter() - start) / batch_size)
+    latency = np.array(latency) * 1000
+    return {
+        "mean_ms": float(np.mean(latency)),
+        "p50_ms": float(np.percentile(latency, 50)),
+        "p90_ms": float(np.percentile(latency, 90)),
+        "p99_ms": float(np.percentile(latency, 99)),
+        "fps": float(1000 / np.mean(latency)),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Benchmark ONNX Runtime session profiles",
+    )
+    parser.add_argument("--model", "-m", type=str, help="Path to ONNX model file", default="./model/model_64cls.onnx")
+    parser.add_argument("--cfg", type=str, help="Session profile config", default="session_cfg.yaml")
+    parser.add_argument("--profiles", "-p", type=str, nargs="+", help="Profiles to benchmark (default: all)")
+    parser.add_argument("--frames", "-f", type=int, help="Number of frames per profile", default=200)
+    parser.add_argument("--warmup", "-w", type=int, help="Number of warmup runs per profile", default=10)
+    parser.add_argument("--batch_size", "-n", type=int, help="Batch size for models with dynamic batch", default=1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    profiles = load_profiles(args.cfg)
+    names = args.profiles or list(profiles)
+    print(f"Benchmarking {args.model}")
+    print(f"{'profile':<16}{'mean(ms)':>10}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}{'fps':>10}")
+    for name in names:
+        if name not in profiles:
+            raise ValueError(f"Session profile '{name}' not found in {args.cfg}")
+        result = benchmark(args.model, profiles[name] or {}, args.frames, args.warmup, args.batch_size)
+        print(
+            f"{name:<16}{result['mean_ms']:>10.2f}{result['p50_ms']:>10.2f}"
+            f"{result['p90_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['fps']:>10.1f}"
+        )
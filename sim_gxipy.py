@@ -0,0 +1,319 @@
+import time
+import queue
+import types
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+###################################################
+#   brief:模拟的 gxipy 相机后端，接口与 gxipy 的      #
+#   DeviceManager/Device/DataStream/RawImage 一致，  #
+#   将视频或图片文件夹按设定帧率回放为 Bayer/RGB 原始帧 #
+#   用于在没有大恒相机和 libgxiapi.so 的机器上测试     #
+###################################################
+
+VIDEO_EXT = {".mp4", ".avi", ".mkv", ".mov"}
+IMAGE_EXT = {".jpg", ".png", ".jpeg", ".bmp", ".tiff"}
+
+
+class GxFrameStatusList:
+    SUCCESS = 0
+    INCOMPLETE = -1
+
+
+# 数值与 gxipy.GxPixelFormatEntry 一致，RGB8 为 GenICam PFNC 中的 RGB8 packed
+class GxPixelFormatEntry:
+    MONO8 = 0x1080001
+    BAYER_GR8 = 0x1080008
+    BAYER_RG8 = 0x1080009
+    BAYER_GB8 = 0x108000A
+    BAYER_BG8 = 0x108000B
+    RGB8 = 0x2180014
+
+
+PIXEL_FORMATS = {
+    "bayer_rg": GxPixelFormatEntry.BAYER_RG8,
+    "bayer_gr": GxPixelFormatEntry.BAYER_GR8,
+    "bayer_gb": GxPixelFormatEntry.BAYER_GB8,
+    "bayer_bg": GxPixelFormatEntry.BAYER_BG8,
+    "mono": GxPixelFormatEntry.MONO8,
+    "rgb": GxPixelFormatEntry.RGB8,
+}
+
+# Bayer 排列左上角 2x2 中 R/G/G/B 分别来自 BGR 图像的哪个通道
+BAYER_PATTERNS = {
+    GxPixelFormatEntry.BAYER_RG8: [[2, 1], [1, 0]],
+    GxPixelFormatEntry.BAYER_GR8: [[1, 2], [0, 1]],
+    GxPixelFormatEntry.BAYER_GB8: [[1, 0], [2, 1]],
+    GxPixelFormatEntry.BAYER_BG8: [[0, 1], [1, 2]],
+}
+
+
+def to_raw(frame, pixel_format):
+    """
+    brief:将 BGR 图像转换为相机输出的原始格式(Bayer 马赛克/灰度/RGB)。
+    """
+    if pixel_format == GxPixelFormatEntry.RGB8:
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    if pixel_format == GxPixelFormatEntry.MONO8:
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = frame.shape[:2]
+    raw = np.empty((h - h % 2, w - w % 2), dtype=np.uint8)
+    for dy, row in enumerate(BAYER_PATTERNS[pixel_format]):
+        for dx, channel in enumerate(row):
+            raw[dy::2, dx::2] = frame[dy : h - h % 2 : 2, dx : w - w % 2 : 2, channel]
+    return raw
+
+
+def load_frames(source, max_frames):
+    """
+    brief:从视频文件或图片文件夹中读取最多 max_frames 帧 BGR 图像。
+    """
+    path = Path(source)
+    frames = []
+    if path.is_file() and path.suffix.lower() in VIDEO_EXT:
+        cap = cv2.VideoCapture(str(path))
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    elif path.is_dir():
+        for img_path in sorted(f for f in path.rglob("*") if f.suffix.lower() in IMAGE_EXT):
+            if len(frames) >= max_frames:
+                break
+            img = cv2.imread(str(img_path))
+            if img is not None:
+                frames.append(img)
+    else:
+        raise FileNotFoundError(f"Invalid simulated camera source: {source}")
+    if not frames:
+        raise RuntimeError(f"No frames could be read from {source}")
+    return frames
+
+
+class Feature:
+    def __init__(self, value=0):
+        self.value = value
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def is_implemented(self):
+        return True
+
+
+class RawImage:
+    def __init__(self, array, frame_id, timestamp, pixel_format, status=GxFrameStatusList.SUCCESS):
+        self.array = array
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.pixel_format = pixel_format
+        self.status = status
+
+    def get_numpy_array(self):
+        if self.status != GxFrameStatusList.SUCCESS:
+            print("RawImage.get_numpy_array: This is a incomplete image")
+            return None
+        return self.array
+
+    def get_data(self):
+        return self.array.tobytes()
+
+    def get_status(self):
+        return self.status
+
+    def get_width(self):
+        return self.array.shape[1]
+
+    def get_height(self):
+        return self.array.shape[0]
+
+    def get_pixel_format(self):
+        return self.pixel_format
+
+    def get_image_size(self):
+        return self.array.nbytes
+
+    def get_frame_id(self):
+        return self.frame_id
+
+    def get_timestamp(self):
+        return self.timestamp
+
+
+class DataStream:
+    def __init__(self, buffer_number=5):
+        """
+        brief:模拟 SDK 的采集缓冲区，缓冲区满时新到达的帧被丢弃(接收端表现为 frame_id 不连续)。
+        """
+        self.buffer = queue.Queue(maxsize=buffer_number)
+        self.capture_callback = None
+        self.acquisition_flag = False
+
+    def set_acquisition_buffer_number(self, buf_num):
+        self.buffer = queue.Queue(maxsize=buf_num)
+
+    def register_capture_callback(self, callback_func):
+        # 与 gxipy 一致，只接受普通函数
+        if not isinstance(callback_func, types.FunctionType):
+            raise TypeError(
+                f"DataStream.register_capture_callback: Expected callback type is function not {type(callback_func)}"
+            )
+        self.capture_callback = callback_func
+
+    def unregister_capture_callback(self):
+        self.capture_callback = None
+
+    def get_image(self, timeout=1000):
+        if not self.acquisition_flag:
+            print("DataStream.get_image: Current data steam don't  start acquisition")
+            return None
+        try:
+            return self.buffer.get(timeout=timeout / 1000)
+        except queue.Empty:
+            return None
+
+    def flush_queue(self):
+        while True:
+            try:
+                self.buffer.get_nowait()
+            except queue.Empty:
+                return
+
+
+class Device:
+    def __init__(self, frames, fps, jitter, drop_rate, incomplete_rate, pixel_format, loop, seed):
+        self.frames = [to_raw(frame, pixel_format) for frame in frames]
+        self.fps = fps
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.incomplete_rate = incomplete_rate
+        self.pixel_format = pixel_format
+        self.loop = loop
+        self.rng = np.random.default_rng(seed)
+        self.data_stream = [DataStream()]
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.num_generated = 0
+        self.num_dropped = 0  # 模拟传输丢帧
+        self.num_overflow = 0  # 采集缓冲区满导致的丢帧
+
+        h, w = self.frames[0].shape[:2]
+        self.Width = Feature(w)
+        self.Height = Feature(h)
+        self.PixelFormat = Feature(pixel_format)
+        self.AcquisitionFrameRate = Feature(fps)
+        self.ExposureTime = Feature(10000.0)
+        self.Gain = Feature(0.0)
+        self.BalanceWhiteAuto = Feature(0)
+        self.TriggerMode = Feature(0)
+
+    def stream_on(self):
+        self.stop_event.clear()
+        self.data_stream[0].acquisition_flag = True
+        self.threads = [
+            threading.Thread(target=self._produce, daemon=True, name="sim-camera"),
+            threading.Thread(target=self._deliver, daemon=True, name="sim-callback"),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stream_off(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.data_stream[0].acquisition_flag = False
+
+    def close_device(self):
+        if self.threads:
+            self.stream_off()
+
+    def _produce(self):
+        """
+        brief:按 fps 生成帧，帧间隔叠加高斯抖动，按 drop_rate 随机丢帧。
+        timestamp 为主机 time.perf_counter_ns()，可直接用于计算端到端延迟。
+        """
+        stream = self.data_stream[0]
+        interval = 1.0 / self.fps
+        next_time = time.perf_counter()
+        frame_id = 0
+        while not self.stop_event.is_set():
+            idx = frame_id % len(self.frames)
+            if not self.loop and frame_id >= len(self.frames):
+                break
+            next_time += max(0.0, interval + self.rng.normal(0.0, self.jitter))
+            delay = next_time - time.perf_counter()
+            if delay > 0 and self.stop_event.wait(delay):
+                break
+            frame_id += 1
+            self.num_generated += 1
+            if self.rng.random() < self.drop_rate:
+                self.num_dropped += 1
+                continue
+            status = GxFrameStatusList.SUCCESS
+            if self.rng.random() < self.incomplete_rate:
+                status = GxFrameStatusList.INCOMPLETE
+            raw_image = RawImage(self.frames[idx], frame_id, time.perf_counter_ns(), self.pixel_format, status)
+            try:
+                stream.buffer.put_nowait(raw_image)
+            except queue.Full:
+                self.num_overflow += 1
+
+    def _deliver(self):
+        # 注册了回调时由本线程逐帧调用回调，否则帧留在缓冲区中等待 get_image
+        stream = self.data_stream[0]
+        while not self.stop_event.is_set():
+            if stream.capture_callback is None:
+                self.stop_event.wait(0.01)
+                continue
+            try:
+                raw_image = stream.buffer.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            callback = stream.capture_callback
+            if callback is not None:
+                callback(raw_image)
+
+
+class DeviceManager:
+    def __init__(
+        self,
+        source,
+        fps=30.0,
+        jitter=0.0,
+        drop_rate=0.0,
+        incomplete_rate=0.0,
+        pixel_format="bayer_rg",
+        max_frames=100,
+        loop=True,
+        seed=0,
+    ):
+        """
+        brief:模拟相机，source 为视频文件或图片文件夹，预先读取最多 max_frames 帧并转换为原始格式，
+        回放时不再解码，保证帧率稳定。jitter 为帧间隔抖动的标准差(秒)。
+        """
+        if pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unknown pixel format '{pixel_format}', available: {list(PIXEL_FORMATS)}")
+        self.source = source
+        self.options = (fps, jitter, drop_rate, incomplete_rate, PIXEL_FORMATS[pixel_format], loop, seed)
+        self.max_frames = max_frames
+        self.frames = None
+
+    def update_device_list(self):
+        info = {"index": 1, "vendor_name": "Simulated", "model_name": Path(self.source).name, "device_class": 3}
+        return 1, [info]
+
+    def open_device_by_index(self, index):
+        if index != 1:
+            raise ValueError(f"Simulated camera only has device index 1, got {index}")
+        if self.frames is None:
+            self.frames = load_frames(self.source, self.max_frames)
+        return Device(self.frames, *self.options)
@@ -0,0 +1,145 @@
+import json
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+# 标注流水线各阶段，汇总时按此顺序输出
+# grab 为跳过不采样的帧(grab/seek)的耗时，decode 只统计解码出图像的采样帧
+STAGES = ["grab", "decode", "motion", "quality_gate", "preprocess", "ort_run", "postprocess", "visualize", "ood_filter", "dedupe", "save"]
+
+
+class StageTimer:
+    def __init__(self, enabled=True, log_path=None):
+        """
+        brief:记录标注流水线各阶段耗时，结束时输出分位数与直方图。
+        log_path 不为空时，每处理完一帧(batch 模式下为一个 batch)向其追加一行 JSON 记录。
+        """
+        self.enabled = enabled
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.log_file = open(log_path, "w", encoding="utf-8") if enabled and log_path else None
+
+    @contextmanager
+    def measure(self, stage):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage, seconds, count=1):
+        """
+        brief:记录一次耗时，count > 1 时表示该耗时由 count 帧均摊(如一次 batch 推理)。
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.samples[stage].extend([seconds / count] * count)
+        frame = self._current_frame()
+        frame[stage] = frame.get(stage, 0.0) + seconds
+
+    def pop_samples(self):
+        """
+        brief:取出并清空已记录的样本，用于将 worker 进程的统计汇总到主进程。
+        """
+        with self.lock:
+            samples, self.samples = dict(self.samples), defaultdict(list)
+        return samples
+
+    def merge(self, samples):
+        if not self.enabled:
+            return
+        with self.lock:
+            for stage, values in samples.items():
+                self.samples[stage].extend(values)
+
+    def _current_frame(self):
+        # 各线程分别累计自己当前帧的阶段耗时
+        if not hasattr(self.local, "frame"):
+            self.local.frame = {}
+        return self.local.frame
+
+    def take_frame(self):
+        """
+        brief:取出并清空当前线程正在累计的阶段耗时，用于交给处理同一帧的其他线程(如解码线程 -> 推理线程)。
+        """
+        if not self.enabled:
+            return None
+        frame = self._current_frame()
+        self.local.frame = {}
+        return frame
+
+    def merge_frame(self, frame):
+        """
+        brief:将其他线程 take_frame 得到的耗时并入当前线程的当前帧记录。
+        """
+        if not frame:
+            return
+        current = self._current_frame()
+        for stage, seconds in frame.items():
+            current[stage] = current.get(stage, 0.0) + seconds
+
+    def end_frame(self, **meta):
+        if not self.enabled:
+            return
+        frame = self._current_frame()
+        self.local.frame = {}
+        if self.log_file is None or not frame:
+            return
+        record = dict(meta)
+        record["ms"] = {stage: round(seconds * 1000, 3) for stage, seconds in frame.items()}
+        with self.lock:
+            self.log_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def summary(self, num_bins=10, bar_width=40):
+        with self.lock:
+            samples = {stage: np.array(values) * 1000 for stage, values in self.samples.items()}
+        stages = [s for s in STAGES if s in samples] + sorted(set(samples) - set(STAGES))
+
+        lines = [
+            f"{'stage':<14}{'count':>9}{'mean(ms)':>10}{'p50(ms)':>10}{'p90(ms)':>10}"
+            f"{'p99(ms)':>10}{'max(ms)':>10}{'total(s)':>10}"
+        ]
+        for stage in stages:
+            ms = samples[stage]
+            lines.append(
+                f"{stage:<14}{len(ms):>9}{ms.mean():>10.2f}{np.percentile(ms, 50):>10.2f}"
+                f"{np.percentile(ms, 90):>10.2f}{np.percentile(ms, 99):>10.2f}{ms.max():>10.2f}"
+                f"{ms.sum() / 1000:>10.2f}"
+            )
+
+        # 耗时分布跨度大，直方图使用对数分桶
+        for stage in stages:
+            ms = samples[stage]
+            low, high = max(ms.min(), 1e-3), max(ms.max(), 1e-3)
+            edges = np.geomspace(low, high * 1.0001, num_bins + 1)
+            counts, _ = np.histogram(np.clip(ms, low, None), bins=edges)
+            lines.append(f"\n[{stage}] latency histogram (ms)")
+            for i, count in enumerate(counts):
+                bar = "#" * int(round(bar_width * count / max(counts.max(), 1)))
+                lines.append(f"{edges[i]:>9.3f} - {edges[i + 1]:<9.3f}{count:>8} {bar}")
+        return "\n".join(lines)
+
+    def report(self, path=None):
+        if not self.enabled or not self.samples:
+            return
+        text = self.summary()
+        print("\n" + "=" * 60)
+        print("Stage latency:")
+        print(text)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+            print(f"\n阶段耗时统计已保存至: {path}")
+
+    def close(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
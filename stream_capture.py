@@ -0,0 +1,202 @@
+import time
+import threading
+
+import cv2
+
+from thirdparty.bilibili import BiliBili
+
+
+def resolve_stream_url(source):
+    """
+    brief:source 为纯数字时视为哔哩哔哩直播间号，解析出真实的流地址，否则直接作为 HTTP-FLV/HLS/RTSP 地址。
+    直播流地址带有时效，每次重连都重新解析。
+    """
+    if not source.isdigit():
+        return source
+    stream_urls = BiliBili(source).get_real_url()
+    if not stream_urls:
+        raise RuntimeError(f"No playable stream found for bilibili room {source}")
+    return next(iter(stream_urls.values()))
+
+
+class StreamCapture:
+    def __init__(
+        self,
+        source,
+        frame_interval=1,
+        timeout=10.0,
+        max_retries=10,
+        min_backoff=0.5,
+        max_backoff=30.0,
+        stall_threshold=1.0,
+        stable_time=5.0,
+    ):
+        """
+        brief:后台线程拉流解码，只保留最新一帧(latest-frame-wins)，推理永远处理最新画面而不会积压延迟。
+        每次断流/连接失败后都按指数退避重连，连接持续 stable_time 秒以上才重置退避时间与失败次数，
+        连续 max_retries 次连接失败(或连上后很快断开)后放弃(0 表示一直重试)。
+        有总帧数的有限源(点播 HLS、HTTP 文件)读到结尾时视为流结束，不再重连，finished 置位；
+        中途断开时重连并定位到断开处继续读取。
+        两帧之间间隔超过 stall_threshold 秒计为一次卡顿，统计卡顿次数与总时长。
+        接口与 DahengCapture 一致(read/stats/summary/stream_off/finished)。
+        """
+        self.source = source
+        self.frame_interval = frame_interval
+        self.timeout_ms = int(timeout * 1000)
+        self.max_retries = max_retries
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stall_threshold = stall_threshold
+        self.stable_time = stable_time
+        self.lock = threading.Lock()
+        self.new_frame = threading.Condition(self.lock)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="stream-reader")
+        self.latest = None
+        self.error = None
+        self.finished = False
+        self.num_received = 0
+        self.num_skipped = 0  # 未被推理取走就被新帧覆盖的帧
+        self.num_processed = 0
+        self.num_connects = 0
+        self.num_stalls = 0
+        self.stall_time = 0.0
+        self.max_stall = 0.0
+        self.last_frame_at = None
+
+    def start(self):
+        self.thread.start()
+
+    def _open(self):
+        url = resolve_stream_url(self.source)
+        # 旧版 OpenCV 既没有打开/读取超时参数，也没有带参数列表的构造函数，断流时 read 可能长时间阻塞
+        if hasattr(cv2, "CAP_PROP_OPEN_TIMEOUT_MSEC"):
+            params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, self.timeout_ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, self.timeout_ms]
+            return cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+        return cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+
+    def _retry(self, failures, backoff, message):
+        """
+        brief:第 failures 次失败后等待 backoff 秒，返回下一次的退避时间，超过重试次数时抛出异常。
+        """
+        if self.max_retries and failures > self.max_retries:
+            raise RuntimeError(f"Failed to connect to stream {self.source} after {self.max_retries} retries")
+        print(f"[WARN] {message}, retrying in {backoff:.1f}s ({failures}/{self.max_retries or 'inf'})")
+        self.stop_event.wait(backoff)
+        return min(backoff * 2, self.max_backoff)
+
+    def _resume(self, cap, position):
+        """
+        brief:重连后定位到第 position 帧，返回定位后的 cap。
+        seek 不准确的源(如不支持 Range 请求的 HTTP 服务)重新打开后逐帧 grab 过去。
+        """
+        cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == position:
+            return cap
+        cap.release()
+        cap = self._open()
+        for _ in range(position):
+            if not cap.grab():
+                break
+        return cap
+
+    def _run(self):
+        cap = None
+        failures = 0
+        backoff = self.min_backoff
+        connected_at = None
+        total_frames = 0
+        position = 0  # 有限源已读到的帧位置，重连后从这里继续
+        try:
+            while not self.stop_event.is_set():
+                if cap is None:
+                    try:
+                        cap = self._open()
+                    except Exception as e:
+                        print(f"[WARN] Failed to resolve stream {self.source}: {e}")
+                        cap = None
+                    if cap is None or not cap.isOpened():
+                        cap = None
+                        failures += 1
+                        backoff = self._retry(failures, backoff, "Failed to open stream")
+                        continue
+                    self.num_connects += 1
+                    connected_at = time.perf_counter()
+                    # 直播流没有总帧数(0 或负数)
+                    total_frames = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+                    if total_frames and position:
+                        cap = self._resume(cap, position)
+
+                ret, frame = cap.read()
+                now = time.perf_counter()
+                if not ret:
+                    cap.release()
+                    cap = None
+                    if total_frames and position >= total_frames - 1:
+                        # 有限源正常读完，不再重连
+                        self.finished = True
+                        break
+                    if now - connected_at < self.stable_time:
+                        failures += 1
+                    else:
+                        failures, backoff = 0, self.min_backoff
+                    backoff = self._retry(max(failures, 1), backoff, "Stream interrupted")
+                    continue
+                position += 1
+                if self.last_frame_at is not None and now - self.last_frame_at > self.stall_threshold:
+                    stall = now - self.last_frame_at
+                    self.num_stalls += 1
+                    self.stall_time += stall
+                    self.max_stall = max(self.max_stall, stall)
+                self.last_frame_at = now
+
+                seq = self.num_received
+                self.num_received += 1
+                if seq % self.frame_interval != 0:
+                    continue
+                with self.new_frame:
+                    if self.latest is not None:
+                        self.num_skipped += 1
+                    self.latest = (seq, cap.get(cv2.CAP_PROP_POS_MSEC), now, frame)
+                    self.new_frame.notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            if cap is not None:
+                cap.release()
+            with self.new_frame:
+                self.new_frame.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        brief:取出最新一帧，返回 (帧序号, 流时间戳 ms, 解码完成时的 perf_counter, BGR 图像)，超时返回 None。
+        拉流线程因连接失败退出时抛出异常。
+        """
+        with self.new_frame:
+            self.new_frame.wait_for(lambda: self.latest is not None or not self.thread.is_alive(), timeout)
+            item, self.latest = self.latest, None
+        if item is None:
+            if self.error is not None:
+                raise self.error
+            return None
+        self.num_processed += 1
+        return item
+
+    def stats(self):
+        return {
+            "received": self.num_received,
+            "skipped": self.num_skipped,
+            "reconnects": max(self.num_connects - 1, 0),
+            "stall_s": round(self.stall_time, 1),
+        }
+
+    def summary(self):
+        stats = self.stats()
+        return (
+            f"网络流: 解码 {stats['received']} 帧, 已处理 {self.num_processed}, 跳过旧帧 {stats['skipped']}, "
+            f"重连 {stats['reconnects']} 次, 卡顿 {self.num_stalls} 次 共 {self.stall_time:.1f}s (最长 {self.max_stall:.1f}s)"
+        )
+
+    def stream_off(self):
+        self.stop_event.set()
+        self.thread.join()
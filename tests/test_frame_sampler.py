@@ -0,0 +1,140 @@
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pipeline import FrameSampler, blank_block
+
+
+class FakeCapture:
+    def __init__(self, frames, seek_error=0):
+        """
+        brief:按帧序号回放 frames 的 VideoCapture 替身。seek_error 为按帧号 seek 后实际位置的偏差，
+        负数模拟落在目标之前的关键帧，正数模拟越过目标。
+        """
+        self.frames = frames
+        self.seek_error = seek_error
+        self.pos = 0
+        self.released = False
+
+    def grab(self):
+        if self.pos >= len(self.frames):
+            return False
+        self.pos += 1
+        return True
+
+    def read(self):
+        if self.pos >= len(self.frames):
+            return False, None
+        self.pos += 1
+        return True, self.frames[self.pos - 1]
+
+    def set(self, prop, value):
+        self.pos = min(max(0, int(value) + self.seek_error), len(self.frames))
+        return True
+
+    def get(self, prop):
+        return float(self.pos) if prop == cv2.CAP_PROP_POS_FRAMES else 30.0
+
+    def release(self):
+        self.released = True
+
+
+def make_frames(pattern):
+    """
+    brief:pattern 中 0 为黑屏帧，其余为内容帧，帧内容为帧序号 + 1，便于校验读到的是哪一帧。
+    """
+    return [np.full((2, 2), idx + 1 if value else 0, dtype=np.int32) for idx, value in enumerate(pattern)]
+
+
+def is_blank(frame):
+    return frame.max() == 0
+
+
+def sample(frames, mode="grab", seek_error=0, start=0, end=None, frame_interval=1, skip_blank=10):
+    cap = FakeCapture(frames, seek_error)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start - seek_error)
+    reopens = []
+
+    def reopen():
+        reopens.append(True)
+        return FakeCapture(frames, seek_error)
+
+    sampler = FrameSampler(
+        cap, frame_interval, start, end, mode, blank_fn=is_blank, skip_blank=skip_blank, reopen=reopen
+    )
+    out = []
+    for frame_idx, frame in sampler:
+        # 读到的帧必须与帧序号一致
+        assert frame.max() in (0, frame_idx + 1)
+        out.append(frame_idx)
+    return out, sampler, reopens
+
+
+# 两段黑屏，第一段在块内结束，第二段中间有一帧闪烁的内容
+PATTERN = [1] * 25 + [0] * 48 + [1] * 30 + [0] * 15 + [1] + [0] * 20 + [1] * 21
+
+
+def test_content_after_blank_run_is_kept():
+    out, sampler, _ = sample(make_frames(PATTERN))
+    content = [idx for idx, value in enumerate(PATTERN) if value]
+    # 黑屏结束后(第 73 帧起)的内容一帧不少
+    assert set(range(73, 103)) <= set(out)
+    assert sampler.num_blank_skipped > 0
+    assert sampler.num_blank_skipped + len(out) == len(PATTERN)
+    assert set(content) - set(out) <= {118}
+
+
+@pytest.mark.parametrize("seek_error", [-3, 2])
+def test_inaccurate_seek_falls_back_to_grab(seek_error):
+    frames = make_frames(PATTERN)
+    out, sampler, reopens = sample(frames, "seek", seek_error, frame_interval=2, skip_blank=10)
+    grab_out, _, _ = sample(frames, frame_interval=2, skip_blank=10)
+    assert sampler.mode == "grab"
+    assert out == grab_out
+    # 越过目标帧时重新打开视频，不会抛出异常
+    assert bool(reopens) == (seek_error > 0)
+
+
+def test_seek_mode_matches_grab_mode():
+    frames = make_frames(PATTERN)
+    out, sampler, reopens = sample(frames, "seek")
+    assert sampler.mode == "seek"
+    assert not reopens
+    assert out == sample(frames)[0]
+
+
+@pytest.mark.parametrize("frame_interval,skip_blank", [(1, 10), (1, 7), (2, 10), (3, 10)])
+@pytest.mark.parametrize("mode", ["grab", "seek"])
+def test_shards_aligned_to_blocks_match_full_run(frame_interval, skip_blank, mode):
+    rng = np.random.default_rng(frame_interval * 100 + skip_blank)
+    # 随机的黑屏段，其中夹杂少量闪烁的内容帧
+    pattern = np.repeat(rng.integers(0, 2, 40), rng.integers(1, 15, 40))
+    pattern[rng.integers(0, len(pattern), 8)] = 1
+    frames = make_frames(pattern)
+    full, _, _ = sample(frames, mode, frame_interval=frame_interval, skip_blank=skip_blank)
+    block = blank_block(skip_blank, frame_interval)
+    bounds = list(range(0, len(frames), block * 5)) + [None]
+    sharded = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        sharded += sample(frames, mode, start=start, end=end, frame_interval=frame_interval, skip_blank=skip_blank)[0]
+    assert sharded == full
+
+
+def test_inaccurate_seek_during_blank_probe_reopens():
+    # 第 10 帧黑屏，检测第 20 帧时 seek 不准确退回 grab，第 20 帧为内容需要回到第 11 帧
+    frames = make_frames([1] * 10 + [0] * 5 + [1] * 20)
+    out, sampler, reopens = sample(frames, "seek", seek_error=-3)
+    assert sampler.mode == "grab"
+    assert reopens
+    assert out == list(range(len(frames)))
+    # 重新打开的 cap 在迭代结束后释放
+    assert sampler.cap.released
+    # 不能重新打开时明确报错，而不是丢帧
+    cap = FakeCapture(frames, seek_error=-3)
+    with pytest.raises(RuntimeError):
+        list(FrameSampler(cap, mode="seek", blank_fn=is_blank, skip_blank=10))
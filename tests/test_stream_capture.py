@@ -0,0 +1,134 @@
+import sys
+import time
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from stream_capture import StreamCapture
+
+NUM_FRAMES = 60
+
+
+@pytest.fixture(scope="module")
+def video_bytes(tmp_path_factory):
+    """
+    brief:生成一段 MJPEG AVI，每帧左上角写入帧序号对应的灰度，便于校验读到的帧。
+    """
+    path = tmp_path_factory.mktemp("stream") / "v.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for idx in range(NUM_FRAMES):
+        frame = np.full((48, 64, 3), idx * 4, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+    return path.read_bytes()
+
+
+class FileServer:
+    def __init__(self, data, cut_first_at=None, pause_at=None, pause=0.0):
+        """
+        brief:通过 HTTP 提供视频文件。cut_first_at 为第一次请求在该字节处断开连接(模拟断流)，
+        pause_at/pause 为每次请求在该字节处暂停 pause 秒(模拟卡顿)。
+        """
+        server = self
+        self.num_requests = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.num_requests += 1
+                first = server.num_requests == 1
+                self.send_response(200)
+                self.send_header("Content-Type", "video/x-msvideo")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    for offset in range(0, len(data), 4096):
+                        if first and cut_first_at is not None and offset >= cut_first_at:
+                            return
+                        if pause_at is not None and offset <= pause_at < offset + 4096:
+                            time.sleep(pause)
+                        self.wfile.write(data[offset : offset + 4096])
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v.avi"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def drain(capture, timeout=20.0):
+    """
+    brief:读取直到流结束或超时，返回读到的帧序号。
+    """
+    seqs = []
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        item = capture.read(timeout=0.5)
+        if item is not None:
+            seqs.append(item[0])
+        elif capture.finished:
+            break
+    return seqs
+
+
+def run_capture(server, **kwargs):
+    capture = StreamCapture(server.url, min_backoff=0.1, max_retries=3, **kwargs)
+    capture.start()
+    try:
+        seqs = drain(capture)
+    finally:
+        capture.stream_off()
+        server.close()
+    return capture, seqs
+
+
+def test_file_stream_ends_at_eof(video_bytes):
+    capture, seqs = run_capture(FileServer(video_bytes))
+    assert capture.finished
+    assert capture.error is None
+    # 读到结尾后不会重连重放
+    assert capture.num_received == NUM_FRAMES
+    assert capture.stats()["reconnects"] == 0
+    assert seqs and seqs == sorted(set(seqs))
+    assert len(seqs) + capture.num_skipped == NUM_FRAMES
+
+
+def test_interrupted_stream_reconnects_and_resumes(video_bytes):
+    server = FileServer(video_bytes, cut_first_at=len(video_bytes) // 2)
+    capture, _ = run_capture(server)
+    assert capture.finished
+    assert capture.stats()["reconnects"] == 1
+    # 断开处之后的帧只读一次，不会从头重放
+    assert capture.num_received == NUM_FRAMES
+
+
+def test_stall_is_reported(video_bytes):
+    server = FileServer(video_bytes, pause_at=len(video_bytes) // 2, pause=1.5)
+    capture, _ = run_capture(server, stall_threshold=1.0)
+    assert capture.finished
+    assert capture.num_stalls == 1
+    assert capture.max_stall >= 1.0
+    assert capture.stats()["reconnects"] == 0
+
+
+def test_unreachable_stream_gives_up():
+    capture = StreamCapture("http://127.0.0.1:9/none.avi", timeout=1.0, max_retries=2, min_backoff=0.05)
+    capture.start()
+    try:
+        with pytest.raises(RuntimeError):
+            drain(capture, timeout=30.0)
+    finally:
+        capture.stream_off()
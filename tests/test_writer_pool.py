@@ -0,0 +1,80 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pipeline import WriterPool
+
+
+class FakeDisk:
+    def __init__(self):
+        """
+        brief:模拟写盘，full 为 True 时写入失败，写入成功的参数记录在 saved 中。
+        """
+        self.full = False
+        self.saved = []
+        self.lock = threading.Lock()
+
+    def save(self, name):
+        if self.full:
+            raise OSError(28, "No space left on device")
+        with self.lock:
+            self.saved.append(name)
+        return 10
+
+
+@pytest.fixture
+def disk():
+    return FakeDisk()
+
+
+@pytest.fixture
+def pool(disk):
+    pool = WriterPool(disk.save, num_workers=2, queue_size=4)
+    yield pool
+    pool.shutdown()
+
+
+def test_flush_raises_write_error_once(disk, pool):
+    disk.full = True
+    pool.submit("video1_0")
+    with pytest.raises(OSError):
+        pool.flush()
+    # 下一个视频写盘正常时不会再抛出上一个视频的错误
+    disk.full = False
+    pool.submit("video2_0")
+    pool.flush()
+    assert disk.saved == ["video2_0"]
+
+
+def test_submit_raises_write_error_once(disk, pool):
+    disk.full = True
+    pool.submit("video1_0")
+    # 等待失败的任务完成，之后的 submit 抛出该错误
+    for future in list(pool.futures):
+        future.result()
+    with pytest.raises(OSError):
+        pool.submit("video1_1")
+    disk.full = False
+    # 超过清理阈值的大量提交不会再次抛出已经抛出过的错误
+    for idx in range(2, 20):
+        pool.submit(f"video1_{idx}")
+    pool.flush()
+    assert len(disk.saved) == 18
+
+
+def test_discarded_errors_do_not_leak_into_next_video(disk, pool):
+    disk.full = True
+    with pytest.raises(OSError):
+        for idx in range(100):
+            pool.submit(f"video1_{idx}")
+    # 视频已经失败时丢弃其剩余任务的错误
+    pool.flush(discard_errors=True)
+    disk.full = False
+    pool.submit("video2_0")
+    pool.flush()
+    assert disk.saved == ["video2_0"]
+    assert pool.pop_stats()["num_saved"] == 1
@@ -0,0 +1,82 @@
+import sys
+import time
+import hashlib
+import argparse
+from pathlib import Path
+
+import cv2
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from pipeline import SKIP_MODES, FrameSampler  # noqa: E402
+
+###################################################
+#   brief:对比不同跳帧方式下视频采样的耗时，          #
+#   read 为逐帧完整解码(旧版本行为)，grab/seek 见     #
+#   pipeline.FrameSampler，并校验采样帧是否一致       #
+###################################################
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Benchmark frame skipping modes for video sampling",
+    )
+    parser.add_argument("--input", "-i", type=str, help="Path to video file", required=True)
+    parser.add_argument("--skip_frames", "-s", type=int, nargs="+", help="Values of --skip_frames to benchmark", default=[0, 4, 9, 29])
+    parser.add_argument("--modes", type=str, nargs="+", choices=["read"] + SKIP_MODES, help="Modes to benchmark", default=["read"] + SKIP_MODES)
+    parser.add_argument("--max_frames", type=int, help="Only sample the first N frames of the video (default: whole video)", default=None)
+    return parser.parse_args()
+
+
+def read_all(cap, frame_interval, end):
+    """
+    brief:旧版本行为，每一帧都 cap.read() 后丢弃未采样的帧。
+    """
+    frame_idx = 0
+    while end is None or frame_idx < end:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frame_idx % frame_interval == 0:
+            yield frame_idx, frame
+        frame_idx += 1
+
+
+def run(video_path, mode, frame_interval, end):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Failed to open video: {video_path}")
+    if mode == "read":
+        frames = read_all(cap, frame_interval, end)
+    else:
+        frames = FrameSampler(cap, frame_interval, end=end, mode=mode)
+
+    digests = []
+    start = time.perf_counter()
+    for frame_idx, frame in frames:
+        digests.append((frame_idx, hashlib.md5(frame.tobytes()).hexdigest()))
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return elapsed, digests
+
+
+def main():
+    args = parse_args()
+    print(f"Benchmarking {args.input}")
+    print(f"{'skip':>6}{'mode':>8}{'sampled':>10}{'total(s)':>10}{'ms/sample':>11}{'speed-up':>10}{'same':>7}")
+    for skip in args.skip_frames:
+        ref_elapsed, ref_digests = None, None
+        for mode in args.modes:
+            elapsed, digests = run(args.input, mode, skip + 1, args.max_frames)
+            if ref_digests is None:
+                # 第一个模式作为速度与采样结果的参考
+                ref_elapsed, ref_digests = elapsed, digests
+            print(
+                f"{skip:>6}{mode:>8}{len(digests):>10}{elapsed:>10.2f}"
+                f"{elapsed * 1000 / max(len(digests), 1):>11.2f}{ref_elapsed / elapsed:>9.2f}x"
+                f"{str(digests == ref_digests):>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
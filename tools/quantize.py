@@ -0,0 +1,234 @@
+import sys
+import time
+import argparse
+import importlib
+from pathlib import Path
+
+import cv2
+import numpy as np
+from tqdm import tqdm
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    CalibrationMethod,
+    QuantFormat,
+    QuantType,
+    quantize_dynamic,
+    quantize_static,
+)
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from session_profile import load_profile  # noqa: E402
+
+###################################################
+#   brief:生成 INT8 动态/静态量化模型，静态量化使用    #
+#   从比赛视频/图片中抽取的帧做校准，并在留出集上对比   #
+#   FP32 模型的速度与自动标注结果一致性                #
+###################################################
+
+VIDEO_EXT = {".mp4", ".avi", ".mkv", ".mov"}
+IMAGE_EXT = {".jpg", ".png", ".jpeg", ".bmp", ".tiff"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="INT8 quantization tool for auto labeling models",
+    )
+    parser.add_argument("--model", "-m", type=str, help="Path to FP32 ONNX model", default="./model/model_64cls.onnx")
+    parser.add_argument(
+        "--variant",
+        "-v",
+        type=str,
+        choices=["28cls", "32cls", "36cls", "64cls"],
+        help="Model decoder variant (default: guessed from model file name, 36cls otherwise)",
+        default=None,
+    )
+    parser.add_argument("--input", "-i", type=str, help="Video file or directory of videos/images to sample frames from", required=True)
+    parser.add_argument("--output_dir", "-o", type=str, help="Output directory for quantized models (default: next to model)", default=None)
+    parser.add_argument("--calib_frames", type=int, help="Number of frames used for static calibration", default=200)
+    parser.add_argument("--eval_frames", type=int, help="Number of held-out frames used for evaluation", default=200)
+    parser.add_argument("--mode", type=str, nargs="+", choices=["dynamic", "static"], help="Quantization modes", default=["dynamic", "static"])
+    parser.add_argument("--per_channel", action="store_true", help="Per-channel weight quantization for static mode")
+    parser.add_argument("--session_profile", "-p", type=str, help="Session profile used for evaluation", default="cpu_single")
+    parser.add_argument("--min_confidence", "-c", type=float, help="Minimum detection confidence, same as main.py", default=0.5)
+    parser.add_argument("--iou_thres", type=float, help="IoU threshold for matching FP32/INT8 detections", default=0.5)
+    parser.add_argument("--seed", type=int, help="Random seed for frame sampling", default=0)
+    return parser.parse_args()
+
+
+def guess_variant(model_pth):
+    for variant in ("28cls", "32cls", "36cls", "64cls"):
+        if variant in Path(model_pth).stem:
+            return variant
+    return "36cls"
+
+
+def sample_frames(input_path, num_frames, seed):
+    """
+    brief:从视频(在全长上均匀抽帧)或图片文件夹(随机抽取)中采样 num_frames 帧。
+    """
+    path = Path(input_path)
+    if path.is_file():
+        files = [path]
+    elif path.is_dir():
+        files = sorted(f for f in path.rglob("*") if f.suffix.lower() in VIDEO_EXT | IMAGE_EXT)
+    else:
+        raise FileNotFoundError(f"Invalid input path: {input_path}")
+
+    rng = np.random.default_rng(seed)
+    images = [f for f in files if f.suffix.lower() in IMAGE_EXT]
+    videos = [f for f in files if f.suffix.lower() in VIDEO_EXT]
+    frames = []
+    if images:
+        for img_path in rng.permutation(images)[:num_frames]:
+            img = cv2.imread(str(img_path))
+            if img is not None:
+                frames.append(img)
+    if videos:
+        per_video = -(-num_frames // len(videos))
+        for video_path in tqdm(videos, desc="Sampling videos"):
+            cap = cv2.VideoCapture(str(video_path))
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            for frame_idx in np.linspace(0, max(total_frames - 1, 0), per_video).astype(int):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_idx))
+                ret, frame = cap.read()
+                if ret:
+                    frames.append(frame)
+            cap.release()
+    rng.shuffle(frames)
+    return frames[:num_frames]
+
+
+class FrameCalibrationReader(CalibrationDataReader):
+    def __init__(self, model, frames):
+        # 复用 FP32 Model 的 letterbox 预处理，保证校准输入与推理一致
+        self.model = model
+        self.frames = iter(frames)
+
+    def get_next(self):
+        frame = next(self.frames, None)
+        if frame is None:
+            return None
+        # preprocess 返回的是复用缓冲区，需要拷贝
+        return {self.model.input.name: self.model.preprocess(frame).copy()}
+
+
+def detections_to_labels(detections, min_confidence):
+    return [det for det in detections if det.conf >= min_confidence]
+
+
+def compare_labels(model, ref_dets, dets, iou_thres):
+    """
+    brief:按外接矩形 IoU 贪心匹配两组检测，返回(匹配数, 类别一致数, 匹配角点平均误差)。
+    """
+    if not ref_dets or not dets:
+        return 0, 0, []
+    ref_pts = np.array([det.pts for det in ref_dets])
+    pts = np.array([det.pts for det in dets])
+    iou = model.pairwise_iou(np.concatenate([ref_pts, pts]))[: len(ref_pts), len(ref_pts) :]
+    num_matched = 0
+    num_same_cls = 0
+    corner_errors = []
+    while iou.size and iou.max() >= iou_thres:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        num_matched += 1
+        num_same_cls += ref_dets[i].color == dets[j].color and ref_dets[i].id == dets[j].id
+        corner_errors.append(np.linalg.norm(ref_pts[i] - pts[j], axis=1).mean())
+        iou[i, :] = -1
+        iou[:, j] = -1
+    return num_matched, num_same_cls, corner_errors
+
+
+def evaluate(model_cls, ref_model, model_pth, frames, args):
+    model = model_cls(model_pth, session_profile=load_profile(args.session_profile))
+    for frame, _ in frames[:5]:
+        model.infer(frame)
+
+    latency = []
+    num_ref = num_dets = num_matched = num_same_cls = num_same_frames = num_same_saved = 0
+    corner_errors = []
+    for frame, ref_dets in tqdm(frames, desc=Path(model_pth).name):
+        start = time.perf_counter()
+        dets = model.infer(frame)
+        latency.append(time.perf_counter() - start)
+
+        dets = detections_to_labels(dets, args.min_confidence)
+        matched, same_cls, errors = compare_labels(ref_model, ref_dets, dets, args.iou_thres)
+        num_ref += len(ref_dets)
+        num_dets += len(dets)
+        num_matched += matched
+        num_same_cls += same_cls
+        corner_errors.extend(errors)
+        num_same_frames += same_cls == len(ref_dets) == len(dets)
+        # main.py 只保存至少有一个有效检测的帧
+        num_same_saved += bool(ref_dets) == bool(dets)
+    return {
+        "latency_ms": float(np.mean(latency) * 1000),
+        # 没有可比较的检测时视为完全一致
+        "recall": num_matched / num_ref if num_ref else 1.0,
+        "precision": num_matched / num_dets if num_dets else 1.0,
+        "cls_agreement": num_same_cls / num_matched if num_matched else 1.0,
+        "corner_err_px": float(np.mean(corner_errors)) if corner_errors else 0.0,
+        "frame_agreement": num_same_frames / len(frames),
+        "save_agreement": num_same_saved / len(frames),
+    }
+
+
+def main():
+    args = parse_args()
+    variant = args.variant or guess_variant(args.model)
+    model_cls = importlib.import_module(f"model.model_{variant}").Model
+    output_dir = Path(args.output_dir) if args.output_dir else Path(args.model).parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(args.model).stem
+
+    frames = sample_frames(args.input, args.calib_frames + args.eval_frames, args.seed)
+    if len(frames) <= args.calib_frames:
+        raise ValueError(f"Only {len(frames)} frames sampled, not enough for {args.calib_frames} calibration frames plus evaluation")
+    calib_frames, eval_frames = frames[: args.calib_frames], frames[args.calib_frames :]
+    print(f"Sampled {len(calib_frames)} calibration frames and {len(eval_frames)} held-out frames")
+
+    ref_model = model_cls(args.model, session_profile=load_profile(args.session_profile))
+    quantized_models = {}
+    if "dynamic" in args.mode:
+        dst = output_dir / f"{stem}_int8_dynamic.onnx"
+        quantize_dynamic(args.model, str(dst), weight_type=QuantType.QUInt8)
+        quantized_models["dynamic"] = dst
+        print(f"Dynamic quantized model saved to: {dst}")
+    if "static" in args.mode:
+        dst = output_dir / f"{stem}_int8_static.onnx"
+        quantize_static(
+            args.model,
+            str(dst),
+            FrameCalibrationReader(ref_model, calib_frames),
+            quant_format=QuantFormat.QDQ,
+            per_channel=args.per_channel,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+        quantized_models["static"] = dst
+        print(f"Static quantized model saved to: {dst}")
+
+    # FP32 结果作为参考标签
+    ref_frames = [(frame, detections_to_labels(ref_model.infer(frame), args.min_confidence)) for frame in eval_frames]
+    results = {"fp32": evaluate(model_cls, ref_model, args.model, ref_frames, args)}
+    for mode, model_pth in quantized_models.items():
+        results[mode] = evaluate(model_cls, ref_model, str(model_pth), ref_frames, args)
+
+    fp32_latency = results["fp32"]["latency_ms"]
+    print("\n" + "=" * 100)
+    print(
+        f"{'model':<10}{'latency(ms)':>12}{'speed-up':>10}{'recall':>10}{'precision':>11}"
+        f"{'cls_agree':>11}{'corner(px)':>12}{'frame_agree':>13}{'save_agree':>12}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<10}{result['latency_ms']:>12.2f}{fp32_latency / result['latency_ms']:>9.2f}x"
+            f"{result['recall']:>10.1%}{result['precision']:>11.1%}{result['cls_agreement']:>11.1%}"
+            f"{result['corner_err_px']:>12.2f}{result['frame_agreement']:>13.1%}{result['save_agreement']:>12.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()